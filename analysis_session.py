@@ -0,0 +1,126 @@
+"""Analysis session that shares per-user matrices across every view of a dataset."""
+from matrix_generator import MatrixGenerator
+
+
+class AnalysisSession:
+    """
+    Holds a processed dataset and the results derived from it.
+
+    Each user's power, acceleration, development and bracket matrices are generated
+    once and reused by the group, body region and individual user analyses.
+    """
+
+    def __init__(self, processed_df, matrix_generator=None):
+        """
+        Args:
+            processed_df (DataFrame): Output of DataProcessor.preprocess_data
+            matrix_generator (MatrixGenerator): Generator to use, a default one if omitted
+        """
+        self.df = processed_df
+        self.matrix_generator = matrix_generator or MatrixGenerator()
+        self._scored_df = None
+        self._test_arrays = None
+        self._user_matrices = None
+        self._single_user_matrices = {}
+        self._group_analysis = {}
+        self._body_region_averages = {}
+        self._region_metrics = {}
+        self._retest_day_counts = None
+        self._average_changes = {}
+
+    @classmethod
+    def from_incremental(cls, incremental_analysis):
+        """
+        Session over everything stored in an IncrementalAnalysis.
+
+        Test instances, scores and the group analysis are taken from the saved state
+        instead of being recomputed for the whole history.
+        """
+        session = cls(incremental_analysis.df, incremental_analysis.matrix_generator)
+        session._scored_df = incremental_analysis.scored_df
+        session._group_analysis[incremental_analysis.max_tests] = incremental_analysis.group_analysis()
+        session._retest_day_counts = incremental_analysis.partial.retest_day_counts
+        return session
+
+    @property
+    def scored_df(self):
+        """The processed dataset with test instances and development scores for every row."""
+        if self._scored_df is None:
+            self._scored_df = self.matrix_generator.score_dataset(
+                self.matrix_generator.assign_test_instances(self.df))
+        return self._scored_df
+
+    @property
+    def test_arrays(self):
+        """Every user's tests laid out as arrays (see MatrixGenerator.compute_test_arrays)."""
+        if self._test_arrays is None:
+            self._test_arrays = self.matrix_generator.compute_test_arrays(self.scored_df)
+        return self._test_arrays
+
+    @property
+    def user_matrices(self):
+        """Matrices for every user, generated on first access. Only needed for whole-roster output."""
+        if self._user_matrices is None:
+            self._user_matrices = self.matrix_generator.build_user_matrices(self.test_arrays)
+        return self._user_matrices
+
+    def get_user_list(self):
+        """Get sorted list of users in the dataset."""
+        return sorted(self.test_arrays.users)
+
+    def get_user_matrices(self, user_name):
+        """Get the test instance matrices for a single user, built on first request."""
+        if self._user_matrices is not None and user_name in self._user_matrices:
+            return self._user_matrices[user_name]
+
+        if user_name not in self._single_user_matrices:
+            position = self.test_arrays.user_position(user_name)
+            if position < 0:
+                return self.matrix_generator.generate_user_matrices(self.scored_df, user_name)
+            self._single_user_matrices[user_name] = self.matrix_generator.build_single_user_matrices(
+                self.test_arrays, position)
+        return self._single_user_matrices[user_name]
+
+    def group_analysis(self, max_tests=4):
+        """Group-level analysis, as returned by MatrixGenerator.generate_group_analysis."""
+        if max_tests not in self._group_analysis:
+            partial = self.matrix_generator.compute_group_partial(
+                self.df, max_tests, test_arrays=self.test_arrays, retest_day_counts=self.retest_day_counts)
+            self._group_analysis[max_tests] = self.matrix_generator.finalize_group_analysis(partial)
+        return self._group_analysis[max_tests]
+
+    def average_changes(self, max_tests=None):
+        """Changes between consecutive tests, as returned by MatrixGenerator.calculate_average_changes."""
+        if max_tests not in self._average_changes:
+            self._average_changes[max_tests] = self.matrix_generator.calculate_average_changes(
+                self.test_arrays, max_tests)
+        return self._average_changes[max_tests]
+
+    @property
+    def retest_day_counts(self):
+        """Histogram of retests by days since the previous test, shared with the group analysis."""
+        if self._retest_day_counts is None:
+            self._retest_day_counts = self.matrix_generator.retest_interval_histogram(self.df)
+        return self._retest_day_counts
+
+    def retest_intervals(self):
+        """Retest interval statistics, as returned by MatrixGenerator.calculate_retest_intervals."""
+        return self.matrix_generator.summarize_retest_intervals(self.retest_day_counts)
+
+    def body_region_averages(self, max_tests=4):
+        """Body region averages, as returned by MatrixGenerator.calculate_body_region_averages."""
+        if max_tests not in self._body_region_averages:
+            self._body_region_averages[max_tests] = self.matrix_generator.calculate_body_region_averages(
+                self.df, max_tests, scored_df=self.scored_df)
+        return self._body_region_averages[max_tests]
+
+    def all_region_metrics(self, max_tests=4):
+        """Detailed metrics of every region, as returned by MatrixGenerator.get_all_region_metrics."""
+        if max_tests not in self._region_metrics:
+            self._region_metrics[max_tests] = self.matrix_generator.get_all_region_metrics(
+                self.df, max_tests, scored_df=self.scored_df)
+        return self._region_metrics[max_tests]
+
+    def region_metrics(self, region_name, max_tests=4):
+        """Detailed metrics of one region, as returned by MatrixGenerator.get_region_metrics."""
+        return self.all_region_metrics(max_tests).get(region_name, (None,) * 8)
@@ -1,8 +1,17 @@
+import hashlib
+import io
+import json
+import threading
 import streamlit as st
 import pandas as pd
 import numpy as np
-from data_processor import DataProcessor
+from data_processor import DataProcessor, MAX_REPORTED_ERRORS
 from matrix_generator import MatrixGenerator
+from analysis_session import AnalysisSession
+from dataset_cache import DatasetCache
+from athlete_store import AthleteStore
+from incremental_analysis import IncrementalAnalysis
+from bundle_exporter import BundleExporter, EXPORT_FORMATS
 from report_generator import ReportGenerator
 from exercise_constants import VALID_EXERCISES
 from goal_standards import POWER_STANDARDS, ACCELERATION_STANDARDS
@@ -15,39 +24,232 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
-def main():
-    st.markdown("<h1 style='font-size: 3em;'>Site Development Bracketer</h1>", unsafe_allow_html=True)
+# Number of uploads whose processed data and analysis are kept in memory
+MAX_CACHED_DATASETS = 4
+
+# Cached results are only valid for the goal standards they were scored against
+STANDARDS_FINGERPRINT = hashlib.sha256(
+    json.dumps([POWER_STANDARDS, ACCELERATION_STANDARDS], sort_keys=True).encode('utf-8')
+).hexdigest()
+
+def get_source_key(data, compact=False):
+    """Key for the preprocessed form of an upload: hash of its bytes plus processing mode."""
+    key = hashlib.sha256(data).hexdigest()
+    return key + '-compact' if compact else key
+
+def get_history_key(revision, users, start, end, compact=False):
+    """Key for a query of the athlete history, changing whenever the history is written to."""
+    query = json.dumps([revision, users, str(start), str(end)])
+    return get_source_key(query.encode('utf-8'), compact)
+
+def get_dataset_key(source_key):
+    """Cache key for analysis results: the source key plus the goal standards."""
+    return f"{source_key}-{STANDARDS_FINGERPRINT[:16]}"
+
+@st.cache_resource
+def get_dataset_cache():
+    """On-disk cache of preprocessed uploads, shared by all sessions."""
+    return DatasetCache()
+
+@st.cache_resource
+def get_athlete_store():
+    """Local athlete history database, shared by all sessions."""
+    return AthleteStore()
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS, show_spinner="Saving to athlete history...")
+def save_to_history(source_key, _processed_df):
+    """Upsert an upload into the athlete history once; returns the number of new sessions."""
+    return get_athlete_store().upsert(_processed_df)
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS, show_spinner="Loading athlete history...")
+def load_history(history_key, users=None, start=None, end=None, compact=False):
+    """Processed data for a query of the athlete history, shared between reruns as read-only."""
+    return DataProcessor().load_from_store(get_athlete_store(), users, start, end, compact)
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS, show_spinner="Processing upload...")
+def load_dataset(source_key, file_name, _data, compact=False):
+    """
+    Read, validate and preprocess an upload.
+    Returns (is_valid, message, processed_df, memory_report, validation_report).
+
+    Uploads that were processed before are loaded from the on-disk cache instead
+    of being parsed again. The processed DataFrame is shared between reruns rather
+    than copied, so it must be treated as read-only.
+    """
+    dataset_cache = get_dataset_cache()
+    processed_df, memory_report = dataset_cache.get(source_key)
+    if processed_df is not None:
+        return True, "Loaded from cache", processed_df, memory_report, None
 
-    # Initialize processors
     data_processor = DataProcessor()
-    matrix_generator = MatrixGenerator()
+    if file_name.endswith('.csv'):
+        # CSV exports can be very large, so stream them in bounded chunks
+        is_valid, message, processed_df = data_processor.process_csv_in_chunks(
+            io.BytesIO(_data), compact=compact)
+    else:
+        df = pd.read_excel(io.BytesIO(_data))
+        is_valid, message = data_processor.validate_data(df)
+        if is_valid:
+            processed_df = data_processor.preprocess_data(df, compact=compact)
+
+    if not is_valid:
+        return is_valid, message, None, None, data_processor.validation_report
+
+    dataset_cache.put(source_key, processed_df, data_processor.memory_report)
+    return is_valid, message, processed_df, data_processor.memory_report, None
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS, show_spinner="Analyzing data...")
+def get_analysis_session(dataset_key, _processed_df):
+    """Analysis session for a dataset, shared across reruns so its results are computed once."""
+    return AnalysisSession(_processed_df, MatrixGenerator())
+
+@st.cache_resource
+def get_incremental_analysis():
+    """Saved analysis that uploads are appended to in incremental mode, with a lock guarding it."""
+    return IncrementalAnalysis(), threading.Lock()
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS, show_spinner="Loading saved analysis...")
+def get_incremental_session(dataset_key, _incremental_analysis):
+    """Session over all saved data; dataset_key must include the saved analysis revision."""
+    return AnalysisSession.from_incremental(_incremental_analysis)
+
+@st.cache_resource(max_entries=MAX_CACHED_DATASETS, show_spinner=False)
+def get_distribution_chart(dataset_key, _power_counts, _accel_counts):
+    """Distribution chart for a dataset, built once and shared by the preview and the reports."""
+    return ReportGenerator().create_distribution_chart(_power_counts, _accel_counts)
+
+@st.cache_data(max_entries=2 * MAX_CACHED_DATASETS, show_spinner="Building report...")
+def build_report(dataset_key, complete, _power_counts, _accel_counts,
+                 _power_transitions, _accel_transitions, _fig):
+    """Build the complete (with transition tables) or simple HTML report for a dataset."""
     report_generator = ReportGenerator()
+    if complete:
+        return report_generator.generate_downloadable_html(
+            _power_counts, _accel_counts, _power_transitions, _accel_transitions, fig=_fig)
+    return report_generator.generate_downloadable_html(_power_counts, _accel_counts, fig=_fig)
 
-    # File upload
-    uploaded_file = st.file_uploader("Upload your exercise data (CSV or Excel)", 
-                                      type=['csv', 'xlsx'])
+@st.cache_data(max_entries=MAX_CACHED_DATASETS, show_spinner="Exporting all athletes...")
+def build_export_bundle(dataset_key, file_format, _session):
+    """ZIP archive with every athlete's matrices for a dataset."""
+    return BundleExporter(file_format).to_bytes(_session.test_arrays, _session.matrix_generator)
 
-    if uploaded_file is not None:
+def main():
+    st.markdown("<h1 style='font-size: 3em;'>Site Development Bracketer</h1>", unsafe_allow_html=True)
+
+    # Compact mode trades single precision metrics for a much smaller memory footprint
+    compact = st.sidebar.checkbox(
+        "Compact memory mode",
+        value=False,
+        help="Store processed data as categoricals and float32 values. Recommended for very large exports."
+    )
+
+    # Incremental mode adds each upload to a saved analysis instead of starting over
+    incremental = st.sidebar.checkbox(
+        "Incremental mode",
+        value=False,
+        help="Append uploads to the saved analysis. Sessions already saved are skipped, "
+             "so the full history can be re-uploaded. Group counts and transitions are only "
+             "recomputed for athletes with new sessions; region and individual views are "
+             "rebuilt from the full saved history."
+    )
+
+    # Data comes from an upload or from the athlete history saved by earlier uploads
+    data_source = st.sidebar.radio("Data source", ["Upload file", "Saved athlete history"])
+    uploaded_file = None
+    history_query = None
+    save_history = False
+    if data_source == "Upload file":
+        save_history = st.sidebar.checkbox(
+            "Save uploads to athlete history",
+            value=False,
+            help="Keep the processed sessions in a local database. Sessions saved before are updated, not duplicated."
+        )
+
+        # File upload
+        uploaded_file = st.file_uploader("Upload your exercise data (CSV or Excel)", 
+                                          type=['csv', 'xlsx'])
+    else:
+        athlete_store = get_athlete_store()
+        history_users = athlete_store.get_user_list()
+        if not history_users:
+            st.info("No athlete history saved yet. Upload a file with \"Save uploads to athlete history\" enabled.")
+            return
+
+        # Optional cohort and date range, answered from the database indexes
+        cohort = st.sidebar.multiselect("Cohort (all athletes if empty)", history_users)
+        start = end = None
+        if st.sidebar.checkbox("Limit to a date range", value=False):
+            start = st.sidebar.date_input("From")
+            end = st.sidebar.date_input("To")
+            # The end date is inclusive
+            end = pd.Timestamp(end) + pd.Timedelta(days=1)
+            start = pd.Timestamp(start)
+        history_query = (athlete_store.revision, tuple(cohort) or None, start, end)
+
+    if uploaded_file is not None or history_query is not None:
         try:
-            # Load and validate data
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
+            if history_query is not None:
+                # Query the saved history (cached until the history changes)
+                source_key = get_history_key(*history_query, compact)
+                is_valid, message, memory_report, validation_report = True, None, None, None
+                processed_df = load_history(source_key, *history_query[1:], compact)
+                if processed_df.empty:
+                    st.info("No saved sessions match the selected cohort and dates.")
+                    return
             else:
-                df = pd.read_excel(uploaded_file)
-
-            # Validate data
-            is_valid, message = data_processor.validate_data(df)
+                # Load, validate and process data (cached by upload content)
+                data = uploaded_file.getvalue()
+                source_key = get_source_key(data, compact)
+                is_valid, message, processed_df, memory_report, validation_report = load_dataset(
+                    source_key, uploaded_file.name, data, compact)
+            dataset_key = get_dataset_key(source_key)
 
             if not is_valid:
                 st.error(message)
+                if validation_report is not None and not validation_report.empty:
+                    # List the offending rows so they can be fixed in the source file
+                    with st.expander("Rows with validation errors", expanded=True):
+                        if len(validation_report) >= MAX_REPORTED_ERRORS:
+                            st.caption(f"Showing the first {MAX_REPORTED_ERRORS} problems; "
+                                       "rows after the last one listed were not checked")
+                        st.dataframe(validation_report, hide_index=True)
+                        st.download_button(
+                            label="Download Validation Errors CSV",
+                            data=validation_report.to_csv(index=False),
+                            file_name="validation_errors.csv",
+                            mime="text/csv"
+                        )
                 return
 
-            # Process data
-            processed_df = data_processor.preprocess_data(df)
+            if save_history:
+                n_saved = save_to_history(source_key, processed_df)
+                st.caption(f"Saved to athlete history ({n_saved} new sessions)")
 
             # Show data preview in collapsed expander
             with st.expander("Data Preview", expanded=False):
                 st.dataframe(processed_df.head())
+                if memory_report:
+                    st.caption(
+                        f"Memory footprint: {memory_report['before'] / 1e6:.1f} MB before compaction, "
+                        f"{memory_report['after'] / 1e6:.1f} MB after"
+                    )
+
+            # Share per-user matrices across every analysis of this dataset
+            if incremental:
+                incremental_analysis, lock = get_incremental_analysis()
+                with lock:
+                    with st.spinner("Updating saved analysis..."):
+                        n_new_rows, updated_users = incremental_analysis.append(
+                            processed_df, upload_key=source_key)
+                    # Results cover all saved data, so they are cached by its revision, not the upload
+                    dataset_key = get_dataset_key(f"incremental-{incremental_analysis.revision}")
+                    session = get_incremental_session(dataset_key, incremental_analysis)
+                if n_new_rows:
+                    st.info(f"Added {n_new_rows} new rows to the saved analysis; "
+                            f"{len(updated_users)} athletes were updated")
+                st.caption(f"Saved analysis of {len(session.df)} rows from all incremental uploads")
+            else:
+                session = get_analysis_session(dataset_key, processed_df)
 
             # Generate group-level analysis
             (power_counts, accel_counts, single_test_distribution,
@@ -55,7 +257,7 @@ def main():
              power_average, accel_average,
              avg_power_change_1_2, avg_accel_change_1_2,
              avg_power_change_2_3, avg_accel_change_2_3,
-             avg_days_between_tests) = matrix_generator.generate_group_analysis(processed_df)
+             avg_days_between_tests) = session.group_analysis()
 
             # Display group-level analysis
             st.markdown("<h2 style='font-size: 1.875em;'>Group Development Analysis</h2>", unsafe_allow_html=True)
@@ -77,7 +279,17 @@ def main():
 
             # Display Multi-Test User Averages
             st.markdown("<h2 style='font-size: 1.875em;'>Multi-Test User Averages</h2>", unsafe_allow_html=True)
-            st.metric("Average Days Between Tests", f"{avg_days_between_tests:.1f}")
+            retest_intervals = session.retest_intervals()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Average Days Between Tests", f"{avg_days_between_tests:.1f}")
+            with col2:
+                st.metric("Median Days Between Tests", f"{retest_intervals['median']:.1f}")
+            with col3:
+                st.metric("Days Between Tests (25th-75th pct.)",
+                         f"{retest_intervals['p25']:.0f}-{retest_intervals['p75']:.0f}")
+            st.caption(f"Based on {retest_intervals['count']} retests; "
+                      f"90th percentile {retest_intervals['p90']:.0f} days")
 
             # Display Power development distribution and changes
             st.write("Multi-Test Users Power Development Distribution")
@@ -107,6 +319,12 @@ def main():
                 st.metric("Acceleration Change (Test 2→3)", f"{avg_accel_change_2_3:+.1f}%",
                          delta_color="normal")
 
+            # Changes across every retest, for athletes with more than three tests
+            average_changes = session.average_changes()
+            if len(average_changes.columns) > 2:
+                with st.expander("Average Change Between All Consecutive Tests"):
+                    st.dataframe(average_changes.style.format("{:+.1f}%"))
+
             # Display detailed transition analysis
             st.markdown("<h2 style='font-size: 1.875em;'>Detailed Transition Analysis</h2>", unsafe_allow_html=True)
 
@@ -123,14 +341,14 @@ def main():
             with power_tab:
                 for period, matrix in power_transitions_detail.items():
                     st.write(f"Period: {period}")
-                    st.dataframe(matrix, use_container_width=True)
+                    st.dataframe(session.matrix_generator.style_transition_matrix(matrix), use_container_width=True)
                     st.write("---")
 
             # Acceleration transitions tab
             with accel_tab:
                 for period, matrix in accel_transitions_detail.items():
                     st.write(f"Period: {period}")
-                    st.dataframe(matrix, use_container_width=True)
+                    st.dataframe(session.matrix_generator.style_transition_matrix(matrix), use_container_width=True)
                     st.write("---")
 
             # Body Region Meta Analysis
@@ -138,7 +356,7 @@ def main():
             st.write("Group averages by body region for multi-test users")
 
             # Calculate body region averages
-            body_region_averages = matrix_generator.calculate_body_region_averages(processed_df)
+            body_region_averages = session.body_region_averages()
 
             # Create columns for each body region
             region_cols = st.columns(len(VALID_EXERCISES))
@@ -154,6 +372,9 @@ def main():
             st.markdown("<h2 style='font-size: 1.875em;'>Detailed Body Region Analysis</h2>", unsafe_allow_html=True)
             st.write("Detailed exercise metrics by body region (multi-test users only)")
             
+            # Metrics for every region are computed together, then each tab renders its own
+            all_region_metrics = session.all_region_metrics()
+
             # Create tabs for each body region
             region_tabs = st.tabs(list(VALID_EXERCISES.keys()))
             
@@ -163,8 +384,8 @@ def main():
                     st.markdown(f"<h3 style='font-size: 1.5em;'>{region} Region Analysis</h3>", unsafe_allow_html=True)
                     st.write(f"Separate power and acceleration metrics for {region.lower()} region movements (multi-test users only)")
                     
-                    # Get detailed region metrics using the generalized function for all regions
-                    power_df, accel_df, power_changes, accel_changes, lowest_power_exercise, lowest_power_value, lowest_accel_exercise, lowest_accel_value = matrix_generator.get_region_metrics(processed_df, region)
+                    # Get this region's precomputed detailed metrics
+                    power_df, accel_df, power_changes, accel_changes, lowest_power_exercise, lowest_power_value, lowest_accel_exercise, lowest_accel_value = all_region_metrics[region]
             
                     if power_df is not None and accel_df is not None:
                         # Create two columns for power and acceleration
@@ -251,13 +472,12 @@ def main():
 
             # User selection for individual analysis
             st.markdown("<h2 style='font-size: 1.875em;'>Individual User Analysis</h2>", unsafe_allow_html=True)
-            users = data_processor.get_user_list(processed_df)
+            users = session.get_user_list()
             selected_user = st.selectbox("Select User", users)
 
             if selected_user:
                 # Generate matrices
-                matrices = matrix_generator.generate_user_matrices(
-                    processed_df, selected_user)
+                matrices = session.get_user_matrices(selected_user)
 
                 power_matrix, accel_matrix, power_dev_matrix, accel_dev_matrix, overall_dev_matrix, power_brackets, accel_brackets = matrices
 
@@ -319,6 +539,11 @@ def main():
                     (power_counts, "power_group_analysis"),
                     (accel_counts, "acceleration_group_analysis"),
                     (single_test_distribution, "single_test_distribution")
+                ] + [
+                    (matrix, f"{metric}_transitions_{period.lower().replace(' ', '_')}")
+                    for metric, transitions in [("power", power_transitions_detail),
+                                                ("acceleration", accel_transitions_detail)]
+                    for period, matrix in transitions.items()
                 ]:
                     if matrix is not None:
                         st.download_button(
@@ -327,6 +552,20 @@ def main():
                             file_name=f"{selected_user}_{name}_matrix.csv",
                             mime="text/csv"
                         )
+
+                # Bulk export of every athlete, built only when requested
+                st.write("**Export All Athletes**")
+                export_format = st.selectbox("Export format", EXPORT_FORMATS, key="bulk_export_format")
+                requested_key = f"bulk_export_requested_{dataset_key}_{export_format}"
+                if st.button("Prepare Export for All Athletes"):
+                    st.session_state[requested_key] = True
+                if st.session_state.get(requested_key):
+                    st.download_button(
+                        label=f"Download All Athletes ({export_format.upper()} ZIP)",
+                        data=build_export_bundle(dataset_key, export_format, session),
+                        file_name=f"all_athletes_{export_format}.zip",
+                        mime="application/zip"
+                    )
                         
             # Report Generator Section
             st.markdown("<h2 style='font-size: 1.875em;'>Report Generator</h2>", unsafe_allow_html=True)
@@ -339,37 +578,33 @@ def main():
                 
                 # Create columns for buttons
                 report_col1, report_col2, report_col3 = st.columns(3)
-                
-                with report_col1:
-                    # HTML Report button with transition matrices (complete report)
-                    complete_report = report_generator.generate_downloadable_html(
-                        power_counts, 
-                        accel_counts,
-                        power_transitions_detail,
-                        accel_transitions_detail
-                    )
-                    st.download_button(
-                        label="Download Complete HTML Report",
-                        data=complete_report,
-                        file_name="complete_report.html",
-                        mime="text/html",
-                    )
-                
-                with report_col2:
-                    # Simple report with just distribution data
-                    simple_report = report_generator.generate_downloadable_html(
-                        power_counts, 
-                        accel_counts
-                    )
-                    st.download_button(
-                        label="Download Simple Report",
-                        data=simple_report,
-                        file_name="distribution_report.html",
-                        mime="text/html",
-                    )
+
+                # Reports are only built once requested, then cached per dataset
+                fig = get_distribution_chart(dataset_key, power_counts, accel_counts)
+                report_options = [
+                    (report_col1, True, "Complete HTML Report", "complete_report.html"),
+                    (report_col2, False, "Simple Report", "distribution_report.html")
+                ]
+                for report_col, complete, report_name, file_name in report_options:
+                    requested_key = f"report_requested_{dataset_key}_{file_name}"
+                    with report_col:
+                        if st.button(f"Prepare {report_name}", key=f"prepare_{file_name}"):
+                            st.session_state[requested_key] = True
+                        if st.session_state.get(requested_key):
+                            report = build_report(
+                                dataset_key, complete,
+                                power_counts, accel_counts,
+                                power_transitions_detail, accel_transitions_detail,
+                                fig
+                            )
+                            st.download_button(
+                                label=f"Download {report_name}",
+                                data=report,
+                                file_name=file_name,
+                                mime="text/html",
+                            )
                 
                 # Display a preview of the chart
-                fig = report_generator.create_distribution_chart(power_counts, accel_counts)
                 st.plotly_chart(fig, use_container_width=True)
                 st.caption("Preview of distribution chart included in both reports")
                 
@@ -0,0 +1,172 @@
+"""Local SQLite store of processed test sessions that persists between app sessions."""
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+from dataset_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_DATABASE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'athletes.sqlite3')
+
+# Processed DataFrame column -> table column
+STORE_COLUMNS = {
+    'user name': 'user_name',
+    'exercise name': 'exercise_name',
+    'dominance': 'dominance',
+    'exercise createdAt': 'created_at',
+    'power - high': 'power',
+    'acceleration - high': 'acceleration',
+    'sex': 'sex',
+    'full_exercise_name': 'full_exercise_name'
+}
+
+# Timestamps are stored as nanoseconds since the epoch and missing dominance as ''
+# so that the unique key compares them by value
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_name TEXT NOT NULL,
+    exercise_name TEXT NOT NULL,
+    dominance TEXT NOT NULL DEFAULT '',
+    created_at INTEGER NOT NULL,
+    power REAL,
+    acceleration REAL,
+    sex TEXT,
+    full_exercise_name TEXT NOT NULL,
+    UNIQUE (user_name, exercise_name, dominance, created_at)
+);
+CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user_name, created_at);
+CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at);
+"""
+
+UPSERT = f"""
+INSERT INTO sessions ({', '.join(STORE_COLUMNS.values())})
+VALUES ({', '.join('?' * len(STORE_COLUMNS))})
+ON CONFLICT (user_name, exercise_name, dominance, created_at) DO UPDATE SET
+    power = excluded.power,
+    acceleration = excluded.acceleration,
+    sex = excluded.sex,
+    full_exercise_name = excluded.full_exercise_name
+"""
+
+
+def _to_nanoseconds(timestamp):
+    return pd.Timestamp(timestamp).as_unit('ns').value
+
+
+class AthleteStore:
+    """
+    Processed test sessions of every upload, kept in a local SQLite database.
+
+    A session is identified by user, exercise, dominance and timestamp; uploading it
+    again replaces the stored values instead of adding a copy. Queries by user,
+    cohort and date range are answered from indexes, and return DataFrames laid out
+    like the output of DataProcessor.preprocess_data.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE_PATH):
+        """
+        Args:
+            path (str): SQLite database file, created on first use
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # A connection per call, so one store can be shared between Streamlit threads
+        return sqlite3.connect(self.path)
+
+    @property
+    def revision(self):
+        """Counter that changes whenever sessions are written, for cache keys."""
+        with closing(self._connect()) as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def upsert(self, processed_df):
+        """
+        Insert the sessions of a processed upload, replacing ones already stored.
+
+        Args:
+            processed_df (DataFrame): Output of DataProcessor.preprocess_data
+
+        Returns:
+            int: Number of sessions that were not stored before
+        """
+        created_at = pd.to_datetime(processed_df['exercise createdAt'])
+        if created_at.dt.tz is not None:
+            created_at = created_at.dt.tz_convert('UTC').dt.tz_localize(None)
+
+        columns = [
+            processed_df['user name'].astype(str),
+            processed_df['exercise name'].astype(str),
+            processed_df['dominance'].astype(object).where(processed_df['dominance'].notna(), '').astype(str),
+            created_at.dt.as_unit('ns').astype('int64'),
+            processed_df['power - high'].astype(float),
+            processed_df['acceleration - high'].astype(float),
+            processed_df['sex'].astype(str),
+            processed_df['full_exercise_name'].astype(str)
+        ]
+        rows = zip(*(column.tolist() for column in columns))
+
+        with closing(self._connect()) as conn, conn:
+            before = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            conn.executemany(UPSERT, rows)
+            after = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            revision = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.execute(f"PRAGMA user_version = {revision + 1}")
+        return after - before
+
+    def get_user_list(self):
+        """Sorted names of every stored user."""
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT DISTINCT user_name FROM sessions ORDER BY user_name")]
+
+    def load(self, users=None, start=None, end=None):
+        """
+        Stored sessions, optionally limited to a cohort of users and a date range.
+
+        Args:
+            users (list): User names to include, all users if omitted
+            start: Earliest timestamp to include
+            end: Timestamp to stop before (exclusive)
+
+        Returns:
+            DataFrame: Sessions sorted by user and timestamp, as from DataProcessor.preprocess_data
+        """
+        conditions, params = [], []
+        if users is not None:
+            conditions.append("user_name IN (SELECT user_name FROM cohort)")
+        if start is not None:
+            conditions.append("created_at >= ?")
+            params.append(_to_nanoseconds(start))
+        if end is not None:
+            conditions.append("created_at < ?")
+            params.append(_to_nanoseconds(end))
+
+        query = f"SELECT {', '.join(STORE_COLUMNS.values())} FROM sessions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY user_name, created_at"
+
+        with closing(self._connect()) as conn:
+            if users is not None:
+                # A temporary table keeps large cohorts within SQLite's parameter limit
+                conn.execute("CREATE TEMP TABLE cohort (user_name TEXT PRIMARY KEY)")
+                conn.executemany("INSERT OR IGNORE INTO cohort VALUES (?)", ((str(user),) for user in users))
+            df = pd.read_sql_query(query, conn, params=params)
+
+        df.columns = list(STORE_COLUMNS)
+        df['dominance'] = df['dominance'].astype(object).where(df['dominance'] != '', None)
+        df['exercise createdAt'] = pd.to_datetime(df['exercise createdAt'], unit='ns')
+        return df
+
+    def load_user(self, user_name, start=None, end=None):
+        """Stored sessions of a single user, see load."""
+        return self.load([user_name], start, end)
@@ -0,0 +1,212 @@
+"""Bulk export of every athlete's matrices as a single ZIP archive."""
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import parquet
+except ImportError:
+    # pyarrow is installed with streamlit; without it only CSV export is available
+    pa = None
+    parquet = None
+
+# Names of the seven matrices returned for each user by MatrixGenerator
+USER_MATRIX_NAMES = [
+    'power', 'acceleration', 'power_development', 'acceleration_development',
+    'overall_development', 'power_brackets', 'acceleration_brackets'
+]
+EXPORT_FORMATS = ['csv', 'parquet']
+OVERALL_ROWS = ['Power Average', 'Acceleration Average', 'Overall Average']
+
+# Users rendered per task; each task's files are written before the next batch starts
+DEFAULT_BLOCK_USERS = 256
+
+
+def _safe_file_name(name):
+    """File system safe version of a user name."""
+    return re.sub(r'[^\w.-]+', '_', str(name)).strip('._') or 'user'
+
+
+def _csv_field(text):
+    """Quote a CSV field the way DataFrame.to_csv does."""
+    if any(char in text for char in ',"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _float_text(values):
+    """Values formatted as DataFrame.to_csv writes them, '' for NaN."""
+    text = values.astype(str)
+    text[np.isnan(values)] = ''
+    return text
+
+
+def _render_block(args):
+    """Process pool entry point: (archive path, bytes) pairs for a block of users."""
+    exporter, arrays, folders, matrix_generator = args
+    return exporter._render_block(arrays, folders, matrix_generator)
+
+
+class BundleExporter:
+    """
+    Writes per-user matrix files for a whole roster into one ZIP archive.
+
+    Files are rendered straight from the shared UserTestArrays, without building
+    per-user DataFrames, in blocks of users spread over a pool of worker processes.
+    The archive itself is written from the calling process, in roster order.
+    """
+
+    def __init__(self, file_format='csv', max_workers=None, block_users=DEFAULT_BLOCK_USERS):
+        """
+        Args:
+            file_format (str): 'csv' or 'parquet' (parquet requires pyarrow)
+            max_workers (int): Worker processes, defaults to the number of CPUs;
+                with 1 the files are rendered in the calling process
+            block_users (int): Users rendered per worker task
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        if file_format == 'parquet' and pa is None:
+            raise ImportError("Parquet export requires pyarrow")
+        self.file_format = file_format
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.block_users = block_users
+        self._schemas = {}
+
+    def _render_csv(self, index, columns, cells):
+        """CSV bytes of a table of already formatted cells, as DataFrame.to_csv writes it."""
+        lines = [',' + ','.join(_csv_field(column) for column in columns)]
+        lines.extend(f"{_csv_field(label)},{','.join(row)}" for label, row in zip(index, cells.tolist()))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def _schema(self, kind, index, columns):
+        """
+        Arrow schema (with pandas metadata) and index column of a table layout.
+
+        Cached per matrix kind, row labels and number of tests.
+        """
+        key = (kind, tuple(index), len(columns))
+        if key not in self._schemas:
+            if kind == 'brackets':
+                template = pd.DataFrame({column: ['x'] * len(index) for column in columns}, index=index, dtype=object)
+            else:
+                template = pd.DataFrame(np.zeros((len(index), len(columns))), index=index, columns=columns)
+            schema = pa.Schema.from_pandas(template)
+            self._schemas[key] = (schema, pa.array(list(index), type=schema.field(len(columns)).type))
+        return self._schemas[key]
+
+    def _render_parquet(self, kind, index, columns, cells):
+        """Parquet bytes of a table, readable with pandas.read_parquet."""
+        schema, index_array = self._schema(kind, index, columns)
+        arrays = [pa.array(cells[:, j], type=schema.field(j).type) for j in range(len(columns))]
+        table = pa.Table.from_arrays(arrays + [index_array], schema=schema)
+        buffer = io.BytesIO()
+        parquet.write_table(table, buffer)
+        return buffer.getvalue()
+
+    def _render_table(self, kind, index, columns, cells):
+        if self.file_format == 'parquet':
+            return self._render_parquet(kind, index, columns, cells)
+        if kind != 'brackets':
+            cells = _float_text(cells)
+        return self._render_csv(index, columns, cells)
+
+    def _render_block(self, arrays, folders, matrix_generator):
+        """Render the files of every user in a block of UserTestArrays."""
+        exercises = matrix_generator.exercises
+        bracket_names = np.array(matrix_generator.bracket_order + [None], dtype=object)
+        files = []
+        for position, folder in enumerate(folders):
+            # Users without a valid sex have no matrices to export
+            if not arrays.valid_sex[position]:
+                continue
+
+            rows = arrays.user_rows(position)
+            columns = [f"Test {i}" for i in range(1, arrays.tests_per_user[position] + 1)]
+            values, development = arrays.values[rows], arrays.development[rows]
+            power_scores, accel_scores = arrays.test_scores[rows, 0], arrays.test_scores[rows, 1]
+            tables = [
+                ('values', exercises, values[..., 0].T),
+                ('values', exercises, values[..., 1].T),
+                ('values', exercises, development[..., 0].T),
+                ('values', exercises, development[..., 1].T),
+                ('values', OVERALL_ROWS, np.array([power_scores, accel_scores, (power_scores + accel_scores) / 2]))
+            ]
+            # Bracket tables have one row per test: category and formatted score
+            for scores, codes in ((power_scores, arrays.power_codes[rows]),
+                                  (accel_scores, arrays.accel_codes[rows])):
+                brackets = np.empty((len(columns), 2), dtype=object)
+                brackets[:, 0] = bracket_names[codes]
+                brackets[:, 1] = [f"{score:.1f}%" if code >= 0 else 'N/A' for score, code in zip(scores, codes)]
+                if self.file_format == 'csv':
+                    brackets[:, 0] = [name or '' for name in brackets[:, 0]]
+                tables.append(('brackets', columns, brackets))
+
+            for name, (kind, index, cells) in zip(USER_MATRIX_NAMES, tables):
+                table_columns = ['Category', 'Score'] if kind == 'brackets' else columns
+                files.append((f"{folder}/{name}.{self.file_format}",
+                              self._render_table(kind, index, table_columns, cells)))
+        return files
+
+    def write(self, output, test_arrays, matrix_generator):
+        """
+        Write the bundle to a path or binary file-like object.
+
+        Args:
+            output: File path, or binary file-like object left open after writing
+            test_arrays (UserTestArrays): Every user's tests, as from AnalysisSession.test_arrays
+            matrix_generator (MatrixGenerator): Generator that built test_arrays
+
+        Returns:
+            int: Number of files written to the archive
+        """
+        # One folder per user; names that collide once sanitized get a numeric suffix
+        folders = []
+        used = set()
+        for user_name in test_arrays.users:
+            folder = base = _safe_file_name(user_name)
+            suffix = 1
+            while folder in used:
+                suffix += 1
+                folder = f"{base}_{suffix}"
+            used.add(folder)
+            folders.append(folder)
+
+        tasks = [
+            (self, test_arrays.user_block(start, start + self.block_users),
+             folders[start:start + self.block_users], matrix_generator)
+            for start in range(0, len(folders), self.block_users)
+        ]
+
+        # Parquet files are compressed already, so they are stored as they are
+        compression = zipfile.ZIP_STORED if self.file_format == 'parquet' else zipfile.ZIP_DEFLATED
+        n_files = 0
+        with zipfile.ZipFile(output, 'w', compression=compression) as archive:
+            for files in self._render_blocks(tasks):
+                for path, data in files:
+                    archive.writestr(path, data)
+                    n_files += 1
+        return n_files
+
+    def _render_blocks(self, tasks):
+        """Rendered files of each block task, in order."""
+        if self.max_workers == 1 or len(tasks) <= 1:
+            yield from map(_render_block, tasks)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            # Keep a bounded number of blocks in flight so memory stays flat for large rosters
+            batch_size = self.max_workers * 2
+            for start in range(0, len(tasks), batch_size):
+                yield from executor.map(_render_block, tasks[start:start + batch_size])
+
+    def to_bytes(self, test_arrays, matrix_generator):
+        """Build the bundle in memory and return the ZIP archive as bytes."""
+        buffer = io.BytesIO()
+        self.write(buffer, test_arrays, matrix_generator)
+        return buffer.getvalue()
@@ -2,98 +2,295 @@ import pandas as pd
 import numpy as np
 from exercise_constants import (
     VALID_EXERCISES,
-    EXERCISE_DOMINANCE,
-    is_valid_exercise_dominance,
-    get_full_exercise_name,
-    standardize_dominance
+    DOMINANCE_REQUIRED,
+    VALID_DOMINANCE_PAIRS,
+    standardize_dominance_series
 )
 
+# Columns with few distinct values repeated on every row
+CATEGORICAL_COLUMNS = ['user name', 'exercise name', 'full_exercise_name', 'dominance', 'sex']
+METRIC_COLUMNS = ['power - high', 'acceleration - high']
+
+# Rows read per chunk when streaming large CSV exports
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Text columns read as strings, so every chunk gets the same type even when the
+# values look numeric (user IDs like "001" keep their leading zeros)
+TEXT_COLUMN_DTYPES = {'user name': str, 'exercise name': str, 'dominance': str, 'sex': str}
+
+# Offending rows kept in a validation report; larger files only report the first ones
+MAX_REPORTED_ERRORS = 1000
+VALIDATION_REPORT_COLUMNS = ['Row', 'Column', 'Value', 'Reason']
+
+def get_memory_usage(df):
+    """Total memory used by a DataFrame in bytes, including string contents."""
+    return int(df.memory_usage(deep=True).sum())
+
+def concat_processed(frames):
+    """Concatenate preprocessed chunks, keeping categorical columns categorical."""
+    frames = list(frames)
+    for col in CATEGORICAL_COLUMNS:
+        if all(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames):
+            # Chunks see different values, so recode them all to the union of categories
+            categories = frames[0][col].cat.categories
+            for frame in frames[1:]:
+                categories = categories.union(frame[col].cat.categories)
+            dtype = pd.CategoricalDtype(categories)
+            frames = [frame.assign(**{col: frame[col].astype(dtype)}) for frame in frames]
+
+    return pd.concat(frames)
+
 class DataProcessor:
     def __init__(self):
         self.required_columns = [
             'user name', 'exercise name', 'dominance', 'exercise createdAt',
             'power - high', 'acceleration - high', 'sex'
         ]
+        self.memory_report = None
+        self.validation_report = pd.DataFrame(columns=VALIDATION_REPORT_COLUMNS)
+        self.validation_error_count = 0
+        # Numeric columns coerced during validation, reused by preprocess_data
+        self._validated_df = None
+        self._numeric_columns = {}
 
     def validate_data(self, df):
-        """Validate only the required columns and their presence."""
+        """
+        Validate only the required columns and their presence.
+
+        Every check runs in one vectorized pass over the rows. Offending rows are
+        listed in self.validation_report (Row is the 1-based data row, capped at
+        MAX_REPORTED_ERRORS entries) and the total in self.validation_error_count.
+        """
+        self.validation_report = pd.DataFrame(columns=VALIDATION_REPORT_COLUMNS)
+        self.validation_error_count = 0
+        self._validated_df = None
+
         # Check required columns (except sex which can be empty)
         required_non_empty = [col for col in self.required_columns if col != 'sex']
         missing_cols = [col for col in required_non_empty if col not in df.columns]
         if missing_cols:
+            self.validation_report = pd.DataFrame({
+                'Row': pd.NA, 'Column': missing_cols, 'Value': None, 'Reason': 'Missing required column'
+            }, columns=VALIDATION_REPORT_COLUMNS)
+            self.validation_error_count = len(missing_cols)
             return False, f"Missing required columns: {', '.join(missing_cols)}"
 
-        # Check for empty values in required columns (except sex)
-        empty_cols = [col for col in required_non_empty if df[col].isna().any()]
-        if empty_cols:
-            return False, f"Empty values found in columns: {', '.join(empty_cols)}"
-
-        # Validate power and acceleration columns contain numeric values
+        # Coerce the numeric columns once; preprocess_data reuses them
         numeric_cols = ['power - high', 'acceleration - high']
-        for col in numeric_cols:
-            if not pd.to_numeric(df[col], errors='coerce').notnull().all():
-                return False, f"Non-numeric values found in {col} column"
+        self._numeric_columns = {col: pd.to_numeric(df[col], errors='coerce') for col in numeric_cols}
+        self._validated_df = df
 
-        # Validate sex values if present
-        valid_sex_values = ['male', 'female', 'Male', 'Female', 'MALE', 'FEMALE']
-        non_empty_sex = df['sex'].dropna()
-        if len(non_empty_sex) > 0:
-            invalid_sex = ~non_empty_sex.str.lower().isin(['male', 'female'])
-            if invalid_sex.any():
-                return False, "Invalid values in sex column. Must be 'male' or 'female' when specified"
+        # One boolean mask per check, in the order the checks are reported
+        checks = []
+        empty = {col: df[col].isna().to_numpy() for col in required_non_empty}
+        checks += [(col, 'Empty value', empty[col]) for col in required_non_empty]
+        checks += [
+            (col, 'Non-numeric value', self._numeric_columns[col].isna().to_numpy() & ~empty[col])
+            for col in numeric_cols
+        ]
+        if 'sex' in df.columns:
+            sex = df['sex']
+            invalid_sex = sex.notna() & ~sex.astype(str).str.lower().isin(['male', 'female'])
+            checks.append(('sex', "Must be 'male' or 'female' when specified", invalid_sex.to_numpy()))
 
-        return True, "Data validation successful"
+        errors = np.column_stack([mask for _, _, mask in checks])
+        self.validation_error_count = int(errors.sum())
+        if self.validation_error_count == 0:
+            return True, "Data validation successful"
 
-    def preprocess_data(self, df):
-        """Clean and prepare the data for matrix generation."""
-        # Create a copy to avoid modifying original data
-        processed_df = df.copy()
+        # Row-ordered list of the first offending cells
+        rows, check_ids = np.nonzero(errors)
+        rows, check_ids = rows[:MAX_REPORTED_ERRORS], check_ids[:MAX_REPORTED_ERRORS]
+        columns = np.array([col for col, _, _ in checks], dtype=object)[check_ids]
+        self.validation_report = pd.DataFrame({
+            'Row': df.index.to_numpy()[rows] + 1,
+            'Column': columns,
+            'Value': [df[col].iat[row] for col, row in zip(columns, rows)],
+            'Reason': np.array([reason for _, reason, _ in checks], dtype=object)[check_ids]
+        }, columns=VALIDATION_REPORT_COLUMNS)
 
-        # Ensure power and acceleration values are numeric
-        processed_df['power - high'] = pd.to_numeric(processed_df['power - high'], errors='coerce')
-        processed_df['acceleration - high'] = pd.to_numeric(processed_df['acceleration - high'], errors='coerce')
+        # Summarize the first failing check, as before
+        failed = errors.any(axis=0)
+        empty_cols = [col for (col, _, _), fail in zip(checks[:len(required_non_empty)], failed) if fail]
+        if empty_cols:
+            return False, f"Empty values found in columns: {', '.join(empty_cols)}"
+        for (col, _, _), fail in zip(checks[len(required_non_empty):], failed[len(required_non_empty):]):
+            if fail and col in numeric_cols:
+                return False, f"Non-numeric values found in {col} column"
+        return False, "Invalid values in sex column. Must be 'male' or 'female' when specified"
 
-        # Remove rows where either power or acceleration is NaN
-        processed_df = processed_df.dropna(subset=['power - high', 'acceleration - high'])
+    def _numeric(self, df, col):
+        """Numeric version of a metric column, reusing the one coerced by validate_data."""
+        if self._validated_df is df and col in self._numeric_columns:
+            return self._numeric_columns[col]
+        return pd.to_numeric(df[col], errors='coerce')
 
-        # Fill empty sex values with 'male'
-        if 'sex' in processed_df.columns:
-            processed_df['sex'] = processed_df['sex'].fillna('male')
-        else:
-            processed_df['sex'] = 'male'
+    def preprocess_data(self, df, compact=False):
+        """
+        Clean and prepare the data for matrix generation.
 
-        # Standardize sex values to lowercase
-        processed_df['sex'] = processed_df['sex'].str.lower()
+        With compact=True the repeated string columns are stored as categoricals and
+        the metrics as float32, which cuts memory use on large exports at the cost of
+        single precision values. The footprint before and after compaction is kept in
+        self.memory_report.
+        """
+        # Ensure power and acceleration values are numeric
+        power = self._numeric(df, 'power - high')
+        acceleration = self._numeric(df, 'acceleration - high')
 
         # Get valid base exercises
         valid_base_exercises = [ex for cat in VALID_EXERCISES.values() for ex in cat]
 
-        # Filter to keep only the specified exercises
-        processed_df = processed_df[processed_df['exercise name'].isin(valid_base_exercises)].copy()
-
         # Standardize dominance values
-        processed_df['dominance'] = processed_df['dominance'].apply(standardize_dominance)
+        dominance = standardize_dominance_series(df['dominance'])
 
-        # Filter valid exercises and dominance combinations
-        valid_rows = []
-        for idx, row in processed_df.iterrows():
-            if is_valid_exercise_dominance(row['exercise name'], row['dominance']):
-                valid_rows.append(idx)
+        # Keep rows with both metrics and a valid exercise and dominance combination
+        exercise_names = df['exercise name']
+        dominance_required = exercise_names.map(DOMINANCE_REQUIRED).astype(bool)
+        valid_pairs = pd.MultiIndex.from_arrays([exercise_names, dominance]).isin(VALID_DOMINANCE_PAIRS)
+        keep = (
+            power.notna() & acceleration.notna()
+            & exercise_names.isin(valid_base_exercises)
+            & (~dominance_required | valid_pairs)
+        )
 
-        processed_df = processed_df.loc[valid_rows].copy()
+        # Filter once; this is the only copy of the input rows
+        processed_df = df[keep].copy()
+        processed_df['power - high'] = power[keep]
+        processed_df['acceleration - high'] = acceleration[keep]
+        processed_df['dominance'] = dominance[keep]
 
-        # Generate full exercise names
-        processed_df['full_exercise_name'] = processed_df.apply(
-            lambda row: get_full_exercise_name(row['exercise name'], row['dominance']),
-            axis=1
+        # Fill empty sex values with 'male' and standardize to lowercase
+        if 'sex' in processed_df.columns:
+            processed_df['sex'] = processed_df['sex'].fillna('male').str.lower()
+        else:
+            processed_df['sex'] = 'male'
+
+        # Generate full exercise names, adding dominance where it is required
+        exercise_names = processed_df['exercise name'].astype(str)
+        processed_df['full_exercise_name'] = exercise_names.where(
+            ~dominance_required[keep],
+            exercise_names + ' (' + processed_df['dominance'].astype(str) + ')'
         )
 
         # Convert timestamp
         processed_df['exercise createdAt'] = pd.to_datetime(processed_df['exercise createdAt'])
 
+        if compact:
+            before = get_memory_usage(processed_df)
+            processed_df = self.compact_data(processed_df)
+            self.memory_report = {'before': before, 'after': get_memory_usage(processed_df)}
+
         # Sort by user and timestamp
         processed_df = processed_df.sort_values(['user name', 'exercise createdAt'])
 
+        # The coerced columns are not needed once this frame is processed
+        self._validated_df = None
+        self._numeric_columns = {}
+
+        return processed_df
+
+    def compact_data(self, df):
+        """Store repeated string columns as categoricals and metrics as float32, in place."""
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        for col in METRIC_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype(np.float32)
+        return df
+
+    def process_csv_in_chunks(self, source, chunksize=DEFAULT_CHUNK_SIZE, compact=False):
+        """
+        Read, validate and preprocess a CSV export in bounded chunks.
+
+        Only the required columns are read, and each chunk is validated and
+        preprocessed before the next one is read, so peak memory depends on the
+        chunk size rather than the file size. After a chunk fails validation the
+        following chunks are still validated, so self.validation_report lists the
+        problems of the whole file, up to MAX_REPORTED_ERRORS of them.
+
+        Args:
+            source: Path or file-like object with CSV data
+            chunksize (int): Number of rows per chunk
+            compact (bool): Store processed chunks in compact form (see preprocess_data)
+
+        Returns:
+            tuple: (is_valid, message, processed_df), processed_df is None if validation fails
+        """
+        reader = pd.read_csv(
+            source,
+            usecols=lambda col: col in self.required_columns,
+            dtype=TEXT_COLUMN_DTYPES,
+            chunksize=chunksize
+        )
+
+        processed_chunks = []
+        memory_before = 0
+        # Problems found in every chunk so far; once one chunk fails the rest are only validated
+        reports, error_count, first_message = [], 0, None
+        rows_checked = 0
+        with reader:
+            for chunk in reader:
+                is_valid, message = self.validate_data(chunk)
+                rows_checked = chunk.index[-1] + 1 if len(chunk) else rows_checked
+                if not is_valid:
+                    if self.validation_report['Row'].isna().all():
+                        # Missing columns: every chunk has the same header
+                        return False, message, None
+                    first_message = first_message or message
+                    reports.append(self.validation_report)
+                    error_count += self.validation_error_count
+                    if sum(len(report) for report in reports) >= MAX_REPORTED_ERRORS:
+                        break
+                if first_message is not None:
+                    processed_chunks = []
+                    continue
+
+                processed_chunks.append(self.preprocess_data(chunk, compact=compact))
+                if compact:
+                    memory_before += self.memory_report['before']
+            else:
+                rows_checked = None
+
+        if first_message is not None:
+            self.validation_report = pd.concat(reports, ignore_index=True).head(MAX_REPORTED_ERRORS)
+            self.validation_error_count = error_count
+            self._validated_df = None
+            if rows_checked is None:
+                return False, f"{first_message} ({error_count} problems found)", None
+            return False, (f"{first_message} (checking stopped after {error_count} problems "
+                           f"in rows 1-{rows_checked}; later rows were not checked)"), None
+
+        if not processed_chunks:
+            return False, "No data rows found", None
+
+        processed_df = concat_processed(processed_chunks)
+        processed_df = processed_df.sort_values(['user name', 'exercise createdAt'])
+        if compact:
+            self.memory_report = {'before': memory_before, 'after': get_memory_usage(processed_df)}
+
+        return True, "Data validation successful", processed_df
+
+    def load_from_store(self, store, users=None, start=None, end=None, compact=False):
+        """
+        Processed data read from an AthleteStore instead of an upload.
+
+        Args:
+            store (AthleteStore): Store to query
+            users (list): Cohort of user names, all users if omitted
+            start: Earliest timestamp to include
+            end: Timestamp to stop before (exclusive)
+            compact (bool): Store the result in compact form (see preprocess_data)
+
+        Returns:
+            DataFrame: Stored sessions, laid out as the output of preprocess_data
+        """
+        processed_df = store.load(users, start, end)
+        if compact:
+            before = get_memory_usage(processed_df)
+            processed_df = self.compact_data(processed_df)
+            self.memory_report = {'before': before, 'after': get_memory_usage(processed_df)}
         return processed_df
 
     def get_user_list(self, df):
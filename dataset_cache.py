@@ -0,0 +1,131 @@
+"""On-disk cache of preprocessed datasets stored as Feather files."""
+import json
+import os
+import uuid
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    # pyarrow is installed with streamlit; without it the cache is disabled
+    pa = None
+    feather = None
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CATEGORIZER_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'categorizer_app')
+)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Bump whenever the output of DataProcessor.preprocess_data changes so that
+# files written by older versions are never reused
+CACHE_FORMAT_VERSION = 2
+
+# Schema metadata key of the JSON written next to each cached DataFrame
+METADATA_KEY = b'categorizer'
+
+
+class DatasetCache:
+    """
+    Persist preprocessed DataFrames keyed by the content hash of their source file.
+
+    Files are written uncompressed so they can be memory-mapped on load. When the
+    cache grows past max_bytes the least recently used files are removed. Column
+    dtypes and the memory report of the processing run are stored with each file,
+    so a cache hit returns the same thing as processing the file again.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (str): Folder that holds the cache files
+            max_bytes (int): Total size the cache may grow to before eviction
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        """Whether the Feather backend is available."""
+        return feather is not None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}-v{CACHE_FORMAT_VERSION}.feather")
+
+    def get(self, key):
+        """
+        Load a cached DataFrame.
+
+        Returns:
+            tuple: (DataFrame, memory report passed to put), (None, None) if not cached
+        """
+        if not self.enabled:
+            return None, None
+
+        path = self._path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            metadata = json.loads(table.schema.metadata[METADATA_KEY])
+        except (FileNotFoundError, KeyError, ValueError, pa.ArrowInvalid):
+            return None, None
+
+        # Mark as recently used for eviction
+        os.utime(path)
+        df = table.to_pandas()
+        # Arrow reads object columns back as pandas' string dtype; rebuild them as written
+        for col in metadata['object_columns']:
+            df[col] = pd.Series(table.column(col).to_numpy(zero_copy_only=False), index=df.index, dtype=object)
+        return df, metadata['memory_report']
+
+    def put(self, key, df, memory_report=None):
+        """
+        Store a DataFrame under key, then evict old files if over the size limit.
+
+        Args:
+            key (str): Cache key, the content hash of the source file
+            df (DataFrame): Processed data
+            memory_report (dict): DataProcessor.memory_report of the run, returned by get
+        """
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+
+        metadata = {
+            'object_columns': [col for col, dtype in df.dtypes.items() if dtype == object],
+            'memory_report': memory_report
+        }
+        table = pa.Table.from_pandas(df)
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, METADATA_KEY: json.dumps(metadata).encode('utf-8')})
+
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Remove least recently used files until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.feather'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
@@ -0,0 +1,79 @@
+"""Precomputed lookup table of every exercise variation, indexed by integer id."""
+import numpy as np
+import pandas as pd
+from exercise_constants import VALID_EXERCISES, EXERCISE_DOMINANCE, ALL_EXERCISES
+from goal_standards import POWER_STANDARDS, ACCELERATION_STANDARDS
+
+SEXES = ('male', 'female')
+METRICS = ('power', 'acceleration')
+
+
+def _read_only(values, dtype):
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+class ExerciseCatalog:
+    """
+    Immutable metadata for every full exercise name (base exercise plus dominance).
+
+    Exercise ids are positions in ALL_EXERCISES, so arrays laid out over
+    MatrixGenerator.exercises can be indexed by id directly. Id -1 marks a name
+    that is not in the catalog.
+    """
+
+    __slots__ = ('names', 'base_names', 'dominance', 'regions',
+                 'region_ids', 'standards', '_index')
+
+    def __init__(self):
+        names, base_names, dominance, region_ids = [], [], [], []
+        for full_name in ALL_EXERCISES:
+            for region_id, exercises in enumerate(VALID_EXERCISES.values()):
+                base = next((exercise for exercise in exercises
+                             if full_name == exercise or full_name.startswith(f"{exercise} (")), None)
+                if base is not None:
+                    break
+            names.append(full_name)
+            base_names.append(base)
+            dominance.append(full_name[len(base) + 2:-1] if EXERCISE_DOMINANCE[base]['required'] else None)
+            region_ids.append(region_id)
+
+        # Goal standard of every exercise, as (sex x exercise x metric); NaN where none is defined
+        standards = np.array([
+            [[metric_standards.get(sex, {}).get(base, np.nan)
+              for metric_standards in (POWER_STANDARDS, ACCELERATION_STANDARDS)]
+             for base in base_names]
+            for sex in SEXES
+        ], dtype=float)
+
+        setter = super().__setattr__
+        setter('names', tuple(names))
+        setter('base_names', tuple(base_names))
+        setter('dominance', tuple(dominance))
+        setter('regions', tuple(VALID_EXERCISES))
+        setter('region_ids', _read_only(region_ids, np.int64))
+        setter('standards', _read_only(standards, float))
+        setter('_index', pd.Index(names))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ExerciseCatalog is immutable")
+
+    def __len__(self):
+        return len(self.names)
+
+    def exercise_ids(self, full_names):
+        """Ids of an array of full exercise names, -1 where a name is not in the catalog."""
+        return self._index.get_indexer(np.asarray(full_names, dtype=object))
+
+    def exercise_id(self, full_name):
+        """Id of a single full exercise name, -1 if it is not in the catalog."""
+        return int(self.exercise_ids([full_name])[0])
+
+    def sex_codes(self, sexes):
+        """Positions of sexes in SEXES, -1 where the sex has no standards."""
+        return pd.Index(SEXES).get_indexer(np.asarray(sexes, dtype=object))
+
+
+# Built once at import; every lookup afterwards is array indexing
+EXERCISE_CATALOG = ExerciseCatalog()
@@ -1,3 +1,7 @@
+import operator
+import numpy as np
+import pandas as pd
+
 # List of valid exercises and their categories
 VALID_EXERCISES = {
     'Torso': [
@@ -34,6 +38,15 @@ EXERCISE_DOMINANCE = {
     'Vertical Jump (Countermovement)': {'required': False, 'values': []}
 }
 
+# Lookup tables derived from EXERCISE_DOMINANCE for vectorized processing
+DOMINANCE_REQUIRED = {exercise: config['required'] for exercise, config in EXERCISE_DOMINANCE.items()}
+VALID_DOMINANCE_PAIRS = {
+    (exercise, dominance)
+    for exercise, config in EXERCISE_DOMINANCE.items()
+    for dominance in config['values']
+}
+STANDARD_DOMINANCE_VALUES = {'dominant': 'Dominant', 'non-dominant': 'Non-Dominant'}
+
 def standardize_dominance(dominance):
     """Convert dominance string to standard format."""
     if not dominance:
@@ -46,6 +59,17 @@ def standardize_dominance(dominance):
         return 'Non-Dominant'
     return dominance
 
+def standardize_dominance_series(dominance):
+    """Vectorized standardize_dominance over a Series of dominance values."""
+    raw = dominance.to_numpy(dtype=object)
+    normalized = pd.Series(raw.astype(str), index=dominance.index).str.strip().str.lower()
+    standardized = normalized.replace(STANDARD_DOMINANCE_VALUES).astype(object)
+
+    # Empty values have no dominance
+    empty = np.frompyfunc(operator.not_, 1, 1)(raw).astype(bool)
+    standardized[empty] = None
+    return standardized
+
 def is_valid_exercise_dominance(exercise_name, dominance):
     """Validate if exercise name and dominance combination is valid."""
     if exercise_name not in EXERCISE_DOMINANCE:
@@ -79,4 +103,5 @@ for exercises in VALID_EXERCISES.values():
                 get_full_exercise_name(exercise, "Non-Dominant")
             ])
         else:
-            ALL_EXERCISES.append(exercise)
\ No newline at end of file
+            ALL_EXERCISES.append(exercise)
+
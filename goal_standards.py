@@ -1,5 +1,6 @@
 """Goal standards for exercise movements based on sex."""
 import pandas as pd
+import numpy as np
 
 POWER_STANDARDS = {
     'male': {
@@ -28,16 +29,6 @@ POWER_STANDARDS = {
     }
 }
 
-# Add alternate keys for Press/Pull exercises to support various formats
-for sex in ['male', 'female']:
-    # Ensure variations for Horizontal Row
-    if 'Horizontal Row (One Hand)' in POWER_STANDARDS[sex]:
-        POWER_STANDARDS[sex]['Horizontal Row'] = POWER_STANDARDS[sex]['Horizontal Row (One Hand)']
-    
-    # Ensure variations for Chest Press
-    if 'Chest Press (One Hand)' in POWER_STANDARDS[sex]:
-        POWER_STANDARDS[sex]['Chest Press'] = POWER_STANDARDS[sex]['Chest Press (One Hand)']
-
 ACCELERATION_STANDARDS = {
     'male': {
         'Straight Arm Trunk Rotation': 15,
@@ -65,32 +56,17 @@ ACCELERATION_STANDARDS = {
     }
 }
 
-# Add alternate keys for Press/Pull exercises to support various formats
-for sex in ['male', 'female']:
-    # Ensure variations for Horizontal Row
-    if 'Horizontal Row (One Hand)' in ACCELERATION_STANDARDS[sex]:
-        ACCELERATION_STANDARDS[sex]['Horizontal Row'] = ACCELERATION_STANDARDS[sex]['Horizontal Row (One Hand)']
-    
-    # Ensure variations for Chest Press
-    if 'Chest Press (One Hand)' in ACCELERATION_STANDARDS[sex]:
-        ACCELERATION_STANDARDS[sex]['Chest Press'] = ACCELERATION_STANDARDS[sex]['Chest Press (One Hand)']
-
 def get_base_exercise_name(full_exercise_name):
     """Extract base exercise name from full name including dominance."""
-    # Handle exercises with "One Hand" in the name differently
-    if 'One Hand' in full_exercise_name and '(' in full_exercise_name:
-        # For exercises like "Horizontal Row (One Hand) (Dominant)"
-        # We want to return "Horizontal Row (One Hand)" as the base name
-        if full_exercise_name.count('(') > 1:
-            base = full_exercise_name.rsplit('(', 1)[0].strip()
-            return base
-    
-    # Standard case for exercises without "One Hand" in base name
-    if '(' in full_exercise_name:
-        base = full_exercise_name.split('(')[0].strip()
-        return base
-        
-    # No parens, return as is
+    from exercise_catalog import EXERCISE_CATALOG
+
+    exercise_id = EXERCISE_CATALOG.exercise_id(full_exercise_name)
+    if exercise_id >= 0:
+        return EXERCISE_CATALOG.base_names[exercise_id]
+
+    # Names outside the catalog: drop a trailing parenthesised dominance
+    if full_exercise_name.endswith(')') and '(' in full_exercise_name:
+        return full_exercise_name.rsplit('(', 1)[0].strip()
     return full_exercise_name
 
 def calculate_development_score(value, exercise_name, sex, metric_type='power'):
@@ -105,4 +81,46 @@ def calculate_development_score(value, exercise_name, sex, metric_type='power'):
         return None
 
     goal_standard = standards[sex][base_exercise]
-    return (value / goal_standard) * 100 if goal_standard else None
\ No newline at end of file
+    return (value / goal_standard) * 100 if goal_standard else None
+
+def get_standards_array():
+    """
+    Goal standards as a dense (sex x exercise x metric) array.
+
+    The axes follow exercise_catalog.SEXES, catalog exercise ids and
+    exercise_catalog.METRICS. Exercises without a standard hold NaN.
+    """
+    from exercise_catalog import EXERCISE_CATALOG
+
+    return EXERCISE_CATALOG.standards
+
+def calculate_development_score_batch(values, exercise_ids, sex_codes, metric_type='power'):
+    """
+    Batch calculate_development_score over arrays of catalog ids.
+
+    Args:
+        values (array-like): Raw metric values
+        exercise_ids (array-like): Catalog exercise ids, -1 for unknown exercises
+        sex_codes (array-like): Positions in exercise_catalog.SEXES, -1 for unknown sexes
+        metric_type (str): 'power' or 'acceleration'
+
+    Returns:
+        ndarray: Development scores as percentage of goal standard, NaN where no score applies
+    """
+    from exercise_catalog import METRICS
+
+    values = np.asarray(values, dtype=float)
+    exercise_ids = np.asarray(exercise_ids)
+    sex_codes = np.asarray(sex_codes)
+    standards = get_standards_array()
+
+    # Look up every goal standard by (sex, exercise) id; unknown ids get no standard
+    known = (exercise_ids >= 0) & (sex_codes >= 0)
+    goal_standards = np.full(values.shape, np.nan)
+    goal_standards[known] = standards[sex_codes[known], exercise_ids[known], METRICS.index(metric_type)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (values / goal_standards) * 100
+    # Match calculate_development_score: no score for zero values or zero standards
+    scores[(values == 0) | (goal_standards == 0)] = np.nan
+    return scores
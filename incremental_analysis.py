@@ -0,0 +1,231 @@
+"""Group analysis kept on disk and updated in place as new test sessions are appended."""
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+from data_processor import concat_processed
+from dataset_cache import DEFAULT_CACHE_DIR, pa, feather
+from exercise_catalog import EXERCISE_CATALOG
+from matrix_generator import MatrixGenerator, GroupAnalysisPartial
+
+DEFAULT_STATE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'incremental')
+
+# A test session is identified by who did which exercise (and side) when
+SESSION_KEY_COLUMNS = ['user name', 'full_exercise_name', 'exercise createdAt']
+# Columns added to the stored rows; test_instance is 0 for rows that are not part of a test
+DERIVED_COLUMNS = ['test_instance', 'power_development', 'acceleration_development']
+
+# Bump whenever the stored rows or metadata change meaning
+STATE_FORMAT_VERSION = 3
+# Schema metadata key of the JSON state stored with the rows
+STATE_METADATA_KEY = b'incremental_state'
+
+
+def _standards_fingerprint():
+    """Digest of the goal standards the stored development scores were computed with."""
+    return hashlib.sha256(EXERCISE_CATALOG.standards.tobytes()).hexdigest()
+
+
+class IncrementalAnalysis:
+    """
+    Processed rows, per-user test instances and scores, and the group-analysis
+    partial of everything uploaded so far, persisted in a directory.
+
+    append takes a processed upload (the full history or just the new sessions),
+    keeps only the sessions not seen before and recomputes only the athletes they
+    belong to. Their old contribution is subtracted from the group partial and the
+    new one added, so bracket counts and transition matrices are adjusted by delta.
+    Other views (per-user matrices, body regions) are built from df/scored_df as
+    for any dataset. revision changes whenever the saved data does, for cache keys.
+
+    The rows and the state they belong to (partial, revision, upload keys) are
+    saved together in one Feather file, so they can only be replaced together.
+    """
+
+    def __init__(self, directory=DEFAULT_STATE_DIR, max_tests=4, matrix_generator=None):
+        """
+        Args:
+            directory (str): Folder that holds the state files
+            max_tests (int): Number of tests covered by the group analysis
+            matrix_generator (MatrixGenerator): Generator to use, a default one if omitted
+        """
+        if feather is None:
+            raise ImportError("Incremental analysis requires pyarrow")
+        self.directory = directory
+        self.max_tests = max_tests
+        self.matrix_generator = matrix_generator or MatrixGenerator()
+        self.rows = None
+        self.partial = None
+        self.revision = 0
+        # Content keys of uploads appended already, so they are not checked again
+        self.upload_keys = set()
+        self.load()
+
+    @property
+    def _rows_path(self):
+        return os.path.join(self.directory, 'rows.feather')
+
+    def load(self):
+        """Read the saved state, starting empty if there is none or it no longer applies."""
+        self.rows, self.partial = None, None
+        self.upload_keys = set()
+        try:
+            table = feather.read_table(self._rows_path)
+            state = json.loads((table.schema.metadata or {})[STATE_METADATA_KEY])
+        except (FileNotFoundError, KeyError, ValueError):
+            return
+
+        if state.get('version') != STATE_FORMAT_VERSION:
+            return
+        rows = table.to_pandas()
+        self.rows = rows
+        self.revision = state['revision']
+        self.upload_keys = set(state['upload_keys'])
+        if state['standards'] == _standards_fingerprint() and state['max_tests'] == self.max_tests:
+            self.partial = GroupAnalysisPartial.from_dict(state['partial'])
+        else:
+            # Goal standards or the analysis shape changed: rescore everything from the stored rows
+            self.rows = self._analyze_rows(rows.drop(columns=DERIVED_COLUMNS))
+            self.partial = self._group_partial(self.rows)
+
+    def save(self):
+        """Write the state to disk, replacing the previous files."""
+        if self.rows is None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        state = {
+            'version': STATE_FORMAT_VERSION,
+            'standards': _standards_fingerprint(),
+            'max_tests': self.max_tests,
+            'revision': self.revision,
+            'upload_keys': sorted(self.upload_keys),
+            'partial': self.partial.to_dict()
+        }
+
+        # The state goes in the schema metadata, so rows and state are replaced in one step
+        table = pa.Table.from_pandas(self.rows, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, STATE_METADATA_KEY: json.dumps(state).encode('utf-8')})
+
+        # Write to a temporary file first so a crash never leaves a partial file behind
+        tmp_path = f"{self._rows_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self._rows_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        """Forget all saved data."""
+        if os.path.exists(self._rows_path):
+            os.remove(self._rows_path)
+        self.rows, self.partial = None, None
+        self.upload_keys = set()
+        self.revision += 1
+
+    @property
+    def df(self):
+        """Every processed row appended so far, as from DataProcessor.preprocess_data."""
+        if self.rows is None:
+            return None
+        return self.rows.drop(columns=DERIVED_COLUMNS)
+
+    @property
+    def scored_df(self):
+        """Rows that are part of a test, with test instances and development scores."""
+        if self.rows is None:
+            return None
+        return self.rows[self.rows['test_instance'] > 0]
+
+    def append(self, processed_df, upload_key=None, save=True):
+        """
+        Add the sessions of a processed upload that are not stored yet.
+
+        Args:
+            processed_df (DataFrame): Output of DataProcessor.preprocess_data
+            upload_key (str): Content hash of the upload; an upload appended before
+                under the same key is skipped without comparing its rows
+            save (bool): Whether to write the updated state to disk
+
+        Returns:
+            tuple: (number of new rows, names of the users that were recomputed)
+        """
+        if upload_key is not None and upload_key in self.upload_keys:
+            return 0, []
+
+        new_rows = processed_df[[column for column in processed_df.columns if column not in DERIVED_COLUMNS]]
+        if self.rows is not None:
+            # Sessions that are already stored are dropped, so the full history can be re-uploaded.
+            # A session recorded n times is only new from its (stored count + 1)th occurrence.
+            new_keys = new_rows[SESSION_KEY_COLUMNS].astype(object)
+            stored_counts = self.rows[SESSION_KEY_COLUMNS].astype(object).value_counts(dropna=False)
+            seen = stored_counts.reindex(pd.MultiIndex.from_frame(new_keys), fill_value=0).to_numpy()
+            occurrence = new_keys.groupby(SESSION_KEY_COLUMNS, sort=False, dropna=False).cumcount().to_numpy()
+            new_rows = new_rows[occurrence >= seen]
+        if upload_key is not None:
+            self.upload_keys.add(upload_key)
+        if new_rows.empty:
+            if save and upload_key is not None:
+                self.save()
+            return 0, []
+
+        affected_users = pd.unique(new_rows['user name'])
+        if self.rows is None:
+            kept_rows = None
+            combined = new_rows
+        else:
+            is_affected = self.rows['user name'].isin(affected_users).to_numpy()
+            old_rows = self.rows[is_affected]
+            kept_rows = self.rows[~is_affected]
+            # Stored rows first, so each user's first row (and so their sex) is unchanged
+            combined = concat_processed([old_rows.drop(columns=DERIVED_COLUMNS), new_rows])
+
+        updated_rows = self._analyze_rows(combined)
+        updated_partial = self._group_partial(updated_rows)
+        if kept_rows is None:
+            self.rows = updated_rows
+            self.partial = updated_partial
+        else:
+            self.rows = concat_processed([kept_rows, updated_rows]).reset_index(drop=True)
+            self.partial = self.partial.subtract(self._group_partial(old_rows)).merge(updated_partial)
+
+        self.revision += 1
+        if save:
+            self.save()
+        return len(new_rows), list(affected_users)
+
+    def _analyze_rows(self, df):
+        """Processed rows with test instances and development scores added (0 / NaN outside tests)."""
+        df = df.reset_index(drop=True)
+        scored = self.matrix_generator.score_dataset(self.matrix_generator.assign_test_instances(df))
+
+        analyzed = df.copy()
+        test_instance = np.zeros(len(df), dtype=np.int64)
+        test_instance[scored.index] = scored['test_instance'].to_numpy()
+        analyzed['test_instance'] = test_instance
+        for column in DERIVED_COLUMNS[1:]:
+            scores = np.full(len(df), np.nan)
+            scores[scored.index] = scored[column].to_numpy()
+            analyzed[column] = scores
+        return analyzed
+
+    def _group_partial(self, rows):
+        """Group partial of analyzed rows, computed without rescoring them."""
+        test_arrays = self.matrix_generator.compute_test_arrays(rows[rows['test_instance'] > 0])
+        return self.matrix_generator.compute_group_partial(rows, self.max_tests, test_arrays=test_arrays)
+
+    def group_analysis(self):
+        """Group-level analysis of every stored row, as from MatrixGenerator.generate_group_analysis."""
+        if self.partial is None:
+            return None
+        return self.matrix_generator.finalize_group_analysis(self.partial)
+
+    def retest_intervals(self):
+        """Retest interval statistics, as from MatrixGenerator.calculate_retest_intervals."""
+        if self.partial is None:
+            return None
+        return self.matrix_generator.summarize_retest_intervals(self.partial.retest_day_counts)
@@ -1,18 +1,293 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, reduce
 import pandas as pd
 import numpy as np
-from exercise_constants import ALL_EXERCISES, VALID_EXERCISES
-from goal_standards import calculate_development_score
+from exercise_constants import VALID_EXERCISES
+from exercise_catalog import EXERCISE_CATALOG
+from goal_standards import calculate_development_score_batch
+
+def transition_cell_positions(n_rows, n_cols):
+    """
+    Position of each transition matrix cell relative to the diagonal:
+    0 on the diagonal (no change), 1 above it (regression), -1 below it (improvement).
+    """
+    return np.sign(np.arange(n_cols)[np.newaxis, :] - np.arange(n_rows)[:, np.newaxis])
+
+@lru_cache(maxsize=64)
+def _style_transition_counts(index, columns, counts):
+    """Build the Styler for a transition matrix; cached on its labels and counts."""
+    matrix = pd.DataFrame(np.array(counts).reshape(len(index), len(columns)), index=list(index), columns=list(columns))
+
+    # Background color based on cell position
+    base_style = "color: black; font-weight: bold; "
+    colors = np.array([
+        base_style + "background-color: lightgreen;",  # Below diagonal (Improvement)
+        base_style + "background-color: lightblue;",   # Diagonal (No movement)
+        base_style + "background-color: lightcoral;"   # Above diagonal (Regression)
+    ])
+    cell_styles = colors[transition_cell_positions(len(index), len(columns)) + 1]
+
+    # Create a new MultiIndex for the columns with centered text
+    matrix.columns = pd.MultiIndex.from_tuples([
+        ('Ending Bracket', col) for col in matrix.columns
+    ])
+
+    # Apply static color formatting, number formatting, and header styling to the DataFrame
+    return (matrix.style
+            .format("{:.0f}")
+            .apply(lambda dataframe: pd.DataFrame(cell_styles, index=dataframe.index, columns=dataframe.columns), axis=None)
+            .set_table_styles([
+                {
+                    'selector': 'th.col_heading.level0',
+                    'props': [('text-align', 'center'),
+                              ('font-weight', 'bold'),
+                              ('background-color', '#f0f0f0'),
+                              ('color', '#333333')]
+                },
+                {
+                    'selector': 'th.col_heading.level1',
+                    'props': [('text-align', 'center')]
+                }
+            ]))
+
+class UserTestArrays:
+    """
+    Every user's tests laid out as arrays, as built by MatrixGenerator.compute_test_arrays.
+
+    Each (user, test) pair is one row, with a user's tests stored consecutively
+    from offsets[user]. Raw values and development scores are dense
+    (user test x exercise x metric) tensors, with metrics ordered as
+    exercise_catalog.METRICS and NaN wherever a user did not record an exercise
+    in a test. Memory is proportional to the number of tests actually taken, so
+    an athlete with hundreds of retests does not widen every other user's rows.
+    Score arrays are per-test averages capped at 100% (user test x metric), and
+    code arrays hold bracket codes (-1 where there is no score).
+    """
+
+    def __init__(self, users, tests_per_user, valid_sex, values, development,
+                 test_scores, power_codes, accel_codes):
+        self.users = users
+        self.tests_per_user = tests_per_user
+        self.valid_sex = valid_sex
+        self.offsets = np.concatenate([[0], np.cumsum(tests_per_user)])
+        self.values = values
+        self.development = development
+        self.test_scores = test_scores
+        self.power_codes = power_codes
+        self.accel_codes = accel_codes
+        self._user_index = None
+
+    @property
+    def n_tests(self):
+        """Most tests taken by any user."""
+        return int(self.tests_per_user.max(initial=0))
+
+    @property
+    def test_users(self):
+        """Position of the user every row belongs to."""
+        return np.repeat(np.arange(len(self.users)), self.tests_per_user)
+
+    @property
+    def test_numbers(self):
+        """0-based test number of every row."""
+        return np.arange(len(self.values)) - np.repeat(self.offsets[:-1], self.tests_per_user)
+
+    def user_position(self, user_name):
+        """Position of a user in users, or -1 if they have no tests."""
+        if self._user_index is None:
+            self._user_index = pd.Index(self.users)
+        return int(self._user_index.get_indexer([user_name])[0])
+
+    def user_rows(self, position):
+        """Slice of the rows holding one user's tests."""
+        return slice(self.offsets[position], self.offsets[position + 1])
+
+    def user_block(self, start, stop):
+        """UserTestArrays of the users at positions start to stop (exclusive)."""
+        stop = min(stop, len(self.users))
+        rows = slice(self.offsets[start], self.offsets[stop])
+        return UserTestArrays(
+            self.users[start:stop], self.tests_per_user[start:stop], self.valid_sex[start:stop],
+            self.values[rows], self.development[rows], self.test_scores[rows],
+            self.power_codes[rows], self.accel_codes[rows])
+
+    def per_test(self, values, n_tests, fill=np.nan):
+        """
+        Scatter per-row values into a (user x test x ...) array of the first n_tests tests.
+
+        Tests a user did not take are filled with fill.
+        """
+        dense = np.full((len(self.users), n_tests) + values.shape[1:], fill, dtype=np.result_type(values, fill))
+        numbers = self.test_numbers
+        kept = numbers < n_tests
+        dense[self.test_users[kept], numbers[kept]] = values[kept]
+        return dense
+
+    def test_change(self, values, from_test, to_test):
+        """
+        Change of per-row values of every user between two tests.
+
+        Tests are 1-based and need not be consecutive. Returns a (user x ...) array,
+        NaN for users who did not take both tests.
+        """
+        change = np.full((len(self.users),) + values.shape[1:], np.nan)
+        took_both = self.tests_per_user >= max(from_test, to_test)
+        first_rows = self.offsets[:-1][took_both]
+        change[took_both] = values[first_rows + to_test - 1] - values[first_rows + from_test - 1]
+        return change
+
+    def development_change(self, from_test, to_test):
+        """Development score change (user x exercise x metric) between two tests, see test_change."""
+        return self.test_change(self.development, from_test, to_test)
+
+class GroupAnalysisPartial:
+    """
+    Serializable, mergeable group-analysis state for a subset of users.
+
+    Partials computed for disjoint sets of users (worker shards, or sites that
+    each export their own file) are combined with merge, and
+    MatrixGenerator.finalize_group_analysis turns the result into the tables
+    returned by generate_group_analysis. Arrays have the metric (power,
+    acceleration) as their first axis. to_dict/to_json produce plain data that
+    from_dict/from_json restore, so partials can be shipped between machines.
+    """
+
+    FORMAT_VERSION = 2
+    ARRAY_FIELDS = [
+        'bracket_counts', 'single_test_counts', 'single_test_score_sums', 'single_test_score_counts',
+        'transition_counts', 'change_sums', 'change_counts', 'retest_day_counts'
+    ]
+
+    def __init__(self, n_brackets, max_tests, n_changes):
+        # Users with standards for their sex; the tables are empty without any
+        self.valid_sex_users = 0
+        # (metric x bracket + total x test)
+        self.bracket_counts = np.zeros((2, n_brackets + 1, max_tests), dtype=np.int64)
+        # Single test users by bracket, and how many had both brackets known
+        self.single_test_counts = np.zeros((2, n_brackets), dtype=np.int64)
+        self.single_test_categorized = 0
+        self.single_test_score_sums = np.zeros(2)
+        self.single_test_score_counts = np.zeros(2, dtype=np.int64)
+        # (metric x period x from bracket x to bracket)
+        self.transition_counts = np.zeros((2, max_tests - 1, n_brackets, n_brackets), dtype=np.int64)
+        # Per-test average score changes between consecutive tests, (metric x period)
+        self.change_sums = np.zeros((2, n_changes))
+        self.change_counts = np.zeros((2, n_changes), dtype=np.int64)
+        # Number of retests by whole days since the previous test of the same exercise
+        self.retest_day_counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def any_valid_sex(self):
+        return self.valid_sex_users > 0
+
+    @property
+    def n_brackets(self):
+        return self.single_test_counts.shape[1]
+
+    @property
+    def max_tests(self):
+        return self.bracket_counts.shape[2]
+
+    @property
+    def n_changes(self):
+        return self.change_sums.shape[1]
+
+    def merge(self, other):
+        """
+        Combine with the partial of a different set of users into a new partial.
+
+        Partials covering different numbers of tests (or retest intervals) are
+        padded to the larger one.
+        """
+        return self._combine(other, 1)
+
+    def subtract(self, other):
+        """
+        Remove the contribution of a subset of this partial's users, computed on its own.
+
+        Used to replace the partial of users whose data changed; subtracting users
+        that were never merged in gives meaningless (negative) counts.
+        """
+        return self._combine(other, -1)
+
+    def _combine(self, other, sign):
+        if self.n_brackets != other.n_brackets:
+            raise ValueError("Cannot merge partials computed with different development brackets")
+
+        combined = GroupAnalysisPartial(
+            self.n_brackets, max(self.max_tests, other.max_tests), max(self.n_changes, other.n_changes))
+        combined.valid_sex_users = self.valid_sex_users + sign * other.valid_sex_users
+        combined.single_test_categorized = self.single_test_categorized + sign * other.single_test_categorized
+        for name in self.ARRAY_FIELDS:
+            values, other_values = getattr(self, name), getattr(other, name)
+            combined_values = np.zeros(np.maximum(values.shape, other_values.shape), dtype=values.dtype)
+            combined_values[tuple(slice(0, n) for n in values.shape)] += values
+            combined_values[tuple(slice(0, n) for n in other_values.shape)] += sign * other_values
+            setattr(combined, name, combined_values)
+        return combined
+
+    @classmethod
+    def merge_all(cls, partials):
+        """Merge any number of partials into one."""
+        return reduce(cls.merge, partials)
+
+    def to_dict(self):
+        """Plain, JSON-compatible representation of the partial."""
+        data = {
+            'version': self.FORMAT_VERSION,
+            'valid_sex_users': int(self.valid_sex_users),
+            'single_test_categorized': int(self.single_test_categorized),
+            'shape': [self.n_brackets, self.max_tests, self.n_changes]
+        }
+        for name in self.ARRAY_FIELDS:
+            data[name] = getattr(self, name).tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore a partial from the output of to_dict."""
+        if data.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported group analysis partial version: {data.get('version')}")
+
+        partial = cls(*data['shape'])
+        partial.valid_sex_users = data['valid_sex_users']
+        partial.single_test_categorized = data['single_test_categorized']
+        for name in cls.ARRAY_FIELDS:
+            template = getattr(partial, name)
+            values = np.array(data[name], dtype=template.dtype)
+            # Empty nested lists lose their trailing dimensions
+            setattr(partial, name, values.reshape(template.shape) if values.size == 0 else values)
+        return partial
+
+    def to_json(self):
+        """Serialize the partial as a JSON string."""
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        """Restore a partial from the output of to_json."""
+        return cls.from_dict(json.loads(text))
+
+
+def _group_partial_for_shard(args):
+    """Process pool entry point: group-analysis partial for one shard of users."""
+    matrix_generator, shard_df, max_tests = args
+    return matrix_generator.compute_group_partial(shard_df, max_tests)
+
 
 class MatrixGenerator:
     def __init__(self):
-        self.exercises = ALL_EXERCISES
+        self.exercises = list(EXERCISE_CATALOG.names)
+        # Each bracket covers scores from its lower bound up to, not including, its upper bound
         self.development_brackets = {
             'Goal Hit': (100, float('inf')),
-            'Elite': (90, 99.99),
+            'Elite': (90, 100),
             'Above Average': (76, 90),
-            'Average': (51, 75),
-            'Under Developed': (26, 50),
-            'Severely Under Developed': (0, 25)
+            'Average': (51, 76),
+            'Under Developed': (26, 51),
+            'Severely Under Developed': (0, 26)
         }
         # Define bracket order for progression analysis
         self.bracket_order = [
@@ -23,267 +298,379 @@ class MatrixGenerator:
             'Under Developed',
             'Severely Under Developed'
         ]
+        # Ascending lower bounds, searched by categorize_scores
+        self.bracket_lower_bounds = np.array(
+            [self.development_brackets[bracket][0] for bracket in reversed(self.bracket_order)],
+            dtype=float
+        )
+
+    def score_dataset(self, df):
+        """
+        Add power and acceleration development scores for every row of the dataset.
+
+        Each row is scored against the standards for its user's sex (taken from the
+        user's first row, as in generate_user_matrices). Already scored data is
+        returned unchanged.
+        """
+        if 'power_development' in df.columns and 'acceleration_development' in df.columns:
+            return df
+
+        scored_df = df.copy()
+        user_sex = scored_df.groupby('user name', sort=False, observed=True)['sex'].transform('first')
+
+        # Resolve names to catalog ids once and score both metrics from them
+        exercise_ids = EXERCISE_CATALOG.exercise_ids(scored_df['full_exercise_name'])
+        sex_codes = EXERCISE_CATALOG.sex_codes(user_sex)
+        for value_column, score_column, metric_type in [
+            ('power - high', 'power_development', 'power'),
+            ('acceleration - high', 'acceleration_development', 'acceleration')
+        ]:
+            values = pd.to_numeric(scored_df[value_column], errors='coerce').to_numpy(dtype=float)
+            scored_df[score_column] = calculate_development_score_batch(
+                values, exercise_ids, sex_codes, metric_type)
+        return scored_df
+
+    def assign_test_instances(self, df):
+        """
+        Number each user's repeats of an exercise as test instances 1, 2, 3...
+
+        The nth time a user performed an exercise (in timestamp order) belongs to
+        test instance n. Rows missing power or acceleration are not part of any test.
+        """
+        if 'test_instance' in df.columns:
+            return df
+
+        instanced_df = df[df['power - high'].notna() & df['acceleration - high'].notna()].copy()
+
+        # Stable sort keeps the original order for tests recorded at the same time
+        order = np.argsort(instanced_df['exercise createdAt'].to_numpy(), kind='stable')
+        counts = (instanced_df.iloc[order]
+                  .groupby(['user name', 'full_exercise_name'], sort=False, observed=True)
+                  .cumcount()
+                  .to_numpy())
+
+        test_instance = np.empty(len(instanced_df), dtype=np.int64)
+        test_instance[order] = counts + 1
+        instanced_df['test_instance'] = test_instance
+        return instanced_df
+
+    def compute_test_arrays(self, df):
+        """
+        Lay out every user's tests as arrays, computed in one pass over the dataset.
+
+        Returns:
+            UserTestArrays: Raw values, development scores, per-test averages and
+            bracket codes for all users
+        """
+        users = pd.unique(df['user name'])
+        data = self.score_dataset(self.assign_test_instances(df))
+
+        # Pivot every user's tests into (user x exercise x test) arrays in one pass
+        user_codes = pd.Index(users).get_indexer(data['user name'])
+        exercise_codes = EXERCISE_CATALOG.exercise_ids(data['full_exercise_name'])
+        test_codes = data['test_instance'].to_numpy() - 1
+
+        tests_per_user = np.zeros(len(users), dtype=np.int64)
+        np.maximum.at(tests_per_user, user_codes, test_codes + 1)
+
+        # Scatter all rows into dense (user test x exercise x metric) tensors
+        offsets = np.concatenate([[0], np.cumsum(tests_per_user)])
+        known = exercise_codes >= 0
+        shape = (int(offsets[-1]), len(self.exercises), 2)
+        cells = ((offsets[user_codes] + test_codes)[known], exercise_codes[known])
+        values = np.full(shape, np.nan)
+        values[cells] = data[['power - high', 'acceleration - high']].to_numpy(dtype=float)[known]
+        development = np.full(shape, np.nan)
+        development[cells] = data[['power_development', 'acceleration_development']].to_numpy(dtype=float)[known]
+
+        # Development scores need a known sex, taken from each user's first row
+        first_sex = df.drop_duplicates('user name').set_index('user name')['sex'].reindex(users)
+        valid_sex = first_sex.map(
+            lambda sex: isinstance(sex, str) and sex.lower() in ['male', 'female']
+        ).to_numpy(dtype=bool)
+
+        # Per-test averages and brackets for every user, test and metric at once
+        test_scores = self._test_averages(development)
+
+        return UserTestArrays(
+            users, tests_per_user, valid_sex, values, development, test_scores,
+            self.categorize_scores(test_scores[..., 0]), self.categorize_scores(test_scores[..., 1])
+        )
+
+    def build_user_matrices(self, arrays):
+        """Build every user's matrices from UserTestArrays, keyed by user name."""
+        return {user: self.build_single_user_matrices(arrays, i) for i, user in enumerate(arrays.users)}
+
+    def build_single_user_matrices(self, arrays, position):
+        """Build the matrices of the user at a position of UserTestArrays.users."""
+        if not arrays.valid_sex[position]:
+            return {}, {}, None, None, None, None, None
+
+        rows = arrays.user_rows(position)
+        values, development = arrays.values[rows], arrays.development[rows]
+        return self._build_user_matrices(
+            values[..., 0].T, values[..., 1].T,
+            development[..., 0].T, development[..., 1].T,
+            arrays.test_scores[rows, 0], arrays.test_scores[rows, 1],
+            arrays.power_codes[rows], arrays.accel_codes[rows])
 
-    def generate_group_analysis(self, df, max_tests=4):
-        """Generate group-level analysis of development categories."""
-        # Initialize count DataFrames for power and acceleration
+    def generate_all_user_matrices(self, df):
+        """Generate test instance matrices for every user in the dataset, keyed by user name."""
+        return self.build_user_matrices(self.compute_test_arrays(df))
+
+    def generate_group_analysis(self, df, max_tests=4, test_arrays=None):
+        """
+        Generate group-level analysis of development categories.
+
+        Pass max_tests=None to cover every test any user took, and test_arrays
+        (from compute_test_arrays) to reuse arrays that have already been computed
+        for this dataset.
+        """
+        return self.finalize_group_analysis(self.compute_group_partial(df, max_tests, test_arrays))
+
+    def generate_group_analysis_parallel(self, df, max_tests=4, n_workers=None):
+        """
+        generate_group_analysis computed in a process pool, one shard of users per worker.
+
+        Every user's rows go to a single shard, so each worker builds its users'
+        test arrays and a GroupAnalysisPartial independently; the partials are
+        merged into the same outputs generate_group_analysis returns.
+        """
+        n_workers = n_workers or os.cpu_count() or 1
+        shard_ids = pd.factorize(df['user name'])[0] % n_workers
+        shards = [shard for _, shard in df.groupby(shard_ids, sort=False)]
+        if len(shards) <= 1:
+            return self.generate_group_analysis(df, max_tests)
+
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(shards))) as executor:
+            partials = list(executor.map(_group_partial_for_shard, [(self, shard, max_tests) for shard in shards]))
+        return self.finalize_group_analysis(GroupAnalysisPartial.merge_all(partials))
+
+    def compute_group_partial(self, df, max_tests=4, test_arrays=None, retest_day_counts=None):
+        """
+        Group-analysis counts and sums for the users in df, as a GroupAnalysisPartial.
+
+        Arguments are as for generate_group_analysis; retest_day_counts (from
+        retest_interval_histogram) reuses a histogram already computed for df.
+        """
+        if test_arrays is None:
+            test_arrays = self.compute_test_arrays(df)
+        if max_tests is None:
+            max_tests = max(test_arrays.n_tests, 2)
+
+        n_brackets = len(self.bracket_order)
+        # Changes from Test 1 to 2 and 2 to 3 are always reported
+        n_changes = max(max_tests, 3) - 1
+        partial = GroupAnalysisPartial(n_brackets, max_tests, n_changes)
+        partial.valid_sex_users = int(test_arrays.valid_sex.sum())
+
+        tests_per_user = test_arrays.tests_per_user
+        single_test = test_arrays.valid_sex & (tests_per_user == 1)
+        multi_test = test_arrays.valid_sex & (tests_per_user >= 2)
+
+        # (user x test x metric) bracket codes and scores, padded or cut to max_tests
+        codes = test_arrays.per_test(np.stack([test_arrays.power_codes, test_arrays.accel_codes], axis=-1),
+                                     max_tests, fill=-1)
+        scores = test_arrays.per_test(test_arrays.test_scores, n_changes + 1)
+        in_test = multi_test[:, np.newaxis] & (tests_per_user[:, np.newaxis] > np.arange(max_tests))
+
+        # Single test users are only counted when both of their categories are known
+        categorized = single_test & (codes[:, 0, 0] >= 0) & (codes[:, 0, 1] >= 0)
+        partial.single_test_categorized = int(categorized.sum())
+
+        # Per-test average score changes, summed over the multi-test users with both tests
+        changes = scores[multi_test, 1:] - scores[multi_test, :-1]
+
+        for metric in range(2):
+            # Bracket counts per test and transitions between consecutive tests
+            partial.bracket_counts[metric] = self._bracket_counts(codes[..., metric], in_test)
+            partial.transition_counts[metric] = self._transition_counts(codes[..., metric], in_test)
+            partial.single_test_counts[metric] = np.bincount(
+                codes[categorized, 0, metric], minlength=n_brackets)
+
+            first_scores = scores[single_test, 0, metric]
+            partial.single_test_score_sums[metric] = np.nansum(first_scores)
+            partial.single_test_score_counts[metric] = np.sum(~np.isnan(first_scores))
+
+            partial.change_sums[metric] = np.nansum(changes[..., metric], axis=0)
+            partial.change_counts[metric] = np.sum(~np.isnan(changes[..., metric]), axis=0)
+
+        if retest_day_counts is None:
+            retest_day_counts = self.retest_interval_histogram(df)
+        partial.retest_day_counts = retest_day_counts
+        return partial
+
+    def finalize_group_analysis(self, partial):
+        """Turn a GroupAnalysisPartial into the outputs of generate_group_analysis."""
         categories = list(self.development_brackets.keys()) + ['Total Users']
-        power_counts = pd.DataFrame(0, index=categories, columns=[])
-        accel_counts = pd.DataFrame(0, index=categories, columns=[])
-
-        # Initialize single test user distribution
-        single_test_distribution = pd.DataFrame(0, 
-            index=list(self.development_brackets.keys()) + ['Total Users'],
-            columns=['Power', 'Acceleration'])
-
-        # Track single test user averages
-        single_test_power_scores = []
-        single_test_accel_scores = []
-
-        # Track multi-test user changes
-        test1_to_2_power = []
-        test1_to_2_accel = []
-        test2_to_3_power = []
-        test2_to_3_accel = []
-
-        # Initialize transition tracking for all movements
-        power_transitions = {f'Test {i}-{i+1}': [] for i in range(1, max_tests)}
-        accel_transitions = {f'Test {i}-{i+1}': [] for i in range(1, max_tests)}
-
-
-        # Process each user
-        for user in df['user name'].unique():
-            # Generate matrices for user
-            matrices = self.generate_user_matrices(df, user)
-
-            if matrices[2] is not None:  # If development matrices exist
-                _, _, power_dev, accel_dev, overall_dev, power_brackets, accel_brackets = matrices
-
-                # Determine if user has multiple tests
-                has_multiple_tests = len(power_brackets) >= 2
-
-                # Update columns if needed (limited to max_tests)
-                test_columns = [f"Test {i}" for i in range(1, max_tests + 1)]
-                for test in test_columns:
-                    if test not in power_counts.columns:
-                        power_counts[test] = 0
-                        accel_counts[test] = 0
-
-                if not has_multiple_tests:
-                    # Process single test users
-                    if 'Test 1' in power_brackets.index and 'Test 1' in accel_brackets.index:
-                        # Get overall scores from overall_dev matrix
-                        power_score = overall_dev.loc['Power Average', 'Test 1']
-                        accel_score = overall_dev.loc['Acceleration Average', 'Test 1']
-
-                        # Add to single test score lists
-                        if pd.notna(power_score):
-                            single_test_power_scores.append(power_score)
-                        if pd.notna(accel_score):
-                            single_test_accel_scores.append(accel_score)
-
-                        # Get categories for both power and acceleration
-                        power_category = power_brackets.loc['Test 1', 'Category']
-                        accel_category = accel_brackets.loc['Test 1', 'Category']
-
-                        # Only count if both categories are valid
-                        if (power_category in self.development_brackets and 
-                            accel_category in self.development_brackets):
-                            # Increment category counts
-                            single_test_distribution.loc[power_category, 'Power'] += 1
-                            single_test_distribution.loc[accel_category, 'Acceleration'] += 1
-                            # Increment total users (same for both columns)
-                            single_test_distribution.loc['Total Users', 'Power'] += 1
-                            single_test_distribution.loc['Total Users', 'Acceleration'] += 1
+        test_columns = [f"Test {i}" for i in range(1, partial.max_tests + 1)]
 
-                else:
-                    # Process multi-test users
-                    for test, row in power_brackets.iterrows():
-                        if test in test_columns:
-                            category = row['Category']
-                            if category in self.development_brackets:
-                                power_counts.loc[category, test] += 1
-
-                    for test, row in accel_brackets.iterrows():
-                        if test in test_columns:
-                            category = row['Category']
-                            if category in self.development_brackets:
-                                accel_counts.loc[category, test] += 1
-
-                    # Store test scores for calculating averages
-                    if 'Test 1' in overall_dev.columns and 'Test 2' in overall_dev.columns:
-                        power_1 = overall_dev.loc['Power Average', 'Test 1']
-                        power_2 = overall_dev.loc['Power Average', 'Test 2']
-                        accel_1 = overall_dev.loc['Acceleration Average', 'Test 1']
-                        accel_2 = overall_dev.loc['Acceleration Average', 'Test 2']
-
-                        if pd.notna(power_1) and pd.notna(power_2):
-                            power_change_1_2 = power_2 - power_1
-                            test1_to_2_power.append(power_change_1_2)
-
-                        if pd.notna(accel_1) and pd.notna(accel_2):
-                            accel_change_1_2 = accel_2 - accel_1
-                            test1_to_2_accel.append(accel_change_1_2)
-
-                    if 'Test 2' in overall_dev.columns and 'Test 3' in overall_dev.columns:
-                        power_2 = overall_dev.loc['Power Average', 'Test 2']
-                        power_3 = overall_dev.loc['Power Average', 'Test 3']
-                        accel_2 = overall_dev.loc['Acceleration Average', 'Test 2']
-                        accel_3 = overall_dev.loc['Acceleration Average', 'Test 3']
-
-                        if pd.notna(power_2) and pd.notna(power_3):
-                            power_change_2_3 = power_3 - power_2
-                            test2_to_3_power.append(power_change_2_3)
-
-                        if pd.notna(accel_2) and pd.notna(accel_3):
-                            accel_change_2_3 = accel_3 - accel_2
-                            test2_to_3_accel.append(accel_change_2_3)
-
-                    # Increment total users once for all test columns
-                    for test in test_columns:
-                        if test in power_brackets.index:
-                            power_counts.loc['Total Users', test] += 1
-                        if test in accel_brackets.index:
-                            accel_counts.loc['Total Users', test] += 1
-
-                    # Process transitions for multi-test users
-                    for i in range(len(test_columns)-1):
-                        current_test = test_columns[i]
-                        next_test = test_columns[i+1]
-                        transition_col = f'Test {i+1}-{i+2}'
-
-                        # Power transitions
-                        if current_test in power_brackets.index and next_test in power_brackets.index:
-                            current_cat = power_brackets.loc[current_test, 'Category']
-                            next_cat = power_brackets.loc[next_test, 'Category']
-                            self._update_progression_counts(
-                                current_cat, next_cat,
-                                transition_col,
-                                power_transitions[transition_col]
-                            )
-
-                        # Acceleration transitions
-                        if current_test in accel_brackets.index and next_test in accel_brackets.index:
-                            current_cat = accel_brackets.loc[current_test, 'Category']
-                            next_cat = accel_brackets.loc[next_test, 'Category']
-                            self._update_progression_counts(
-                                current_cat, next_cat,
-                                transition_col,
-                                accel_transitions[transition_col]
-                            )
+        if partial.any_valid_sex:
+            power_counts = pd.DataFrame(partial.bracket_counts[0], index=categories, columns=test_columns)
+            accel_counts = pd.DataFrame(partial.bracket_counts[1], index=categories, columns=test_columns)
+        else:
+            power_counts = pd.DataFrame(0, index=categories, columns=[])
+            accel_counts = pd.DataFrame(0, index=categories, columns=[])
+
+        single_test_distribution = pd.DataFrame({
+            'Power': np.append(partial.single_test_counts[0], partial.single_test_categorized),
+            'Acceleration': np.append(partial.single_test_counts[1], partial.single_test_categorized)
+        }, index=categories)
 
         # Calculate actual averages for single test users
-        power_average = np.mean(single_test_power_scores) if single_test_power_scores else 0
-        accel_average = np.mean(single_test_accel_scores) if single_test_accel_scores else 0
-
-        # Generate detailed transition matrices
-        power_transitions_detail = self._analyze_detailed_transitions(power_transitions)
-        accel_transitions_detail = self._analyze_detailed_transitions(accel_transitions)
-
-        # Calculate time differences between tests for the same movement
-        time_differences = []
-        for user in df['user name'].unique():
-            user_data = df[df['user name'] == user].copy()
-            if len(user_data) > 1:
-                # Group by exercise and calculate time differences within each exercise
-                for exercise in user_data['full_exercise_name'].unique():
-                    exercise_data = user_data[user_data['full_exercise_name'] == exercise]
-                    if len(exercise_data) > 1:
-                        # Sort by timestamp
-                        exercise_data = exercise_data.sort_values('exercise createdAt')
-                        # Calculate differences in days
-                        time_diffs = exercise_data['exercise createdAt'].diff().dropna().dt.days
-                        time_differences.extend(time_diffs.tolist())
-        
-        avg_days_between_tests = np.mean(time_differences) if time_differences else 0
+        power_average, accel_average = (
+            self._ratio_or_zero(partial.single_test_score_sums[m], partial.single_test_score_counts[m])
+            for m in range(2)
+        )
+
+        periods = [f'Test {i}-{i+1}' for i in range(1, partial.max_tests)]
+        power_transitions, accel_transitions = (
+            {period: pd.DataFrame(counts, index=self.bracket_order, columns=self.bracket_order)
+             for period, counts in zip(periods, partial.transition_counts[m])}
+            for m in range(2)
+        )
 
         # Calculate average changes
-        avg_power_change_1_2 = np.mean(test1_to_2_power) if test1_to_2_power else 0
-        avg_accel_change_1_2 = np.mean(test1_to_2_accel) if test1_to_2_accel else 0
-        avg_power_change_2_3 = np.mean(test2_to_3_power) if test2_to_3_power else 0
-        avg_accel_change_2_3 = np.mean(test2_to_3_accel) if test2_to_3_accel else 0
+        (avg_power_change_1_2, avg_power_change_2_3), (avg_accel_change_1_2, avg_accel_change_2_3) = (
+            [self._ratio_or_zero(partial.change_sums[m, i], partial.change_counts[m, i]) for i in range(2)]
+            for m in range(2)
+        )
+
+        avg_days_between_tests = self.summarize_retest_intervals(partial.retest_day_counts)['mean']
 
         return (power_counts, accel_counts, single_test_distribution,
-                power_transitions_detail, accel_transitions_detail,
+                power_transitions, accel_transitions,
                 power_average, accel_average,
                 avg_power_change_1_2, avg_accel_change_1_2,
                 avg_power_change_2_3, avg_accel_change_2_3,
                 avg_days_between_tests)
 
-    def _update_progression_counts(self, current_cat, next_cat, col, transitions_list):
-        """Update progression counts based on category changes."""
-        if current_cat and next_cat and pd.notna(current_cat) and pd.notna(next_cat):
-            try:
-                # Record the transition for detailed analysis
-                transitions_list.append((current_cat, next_cat))
+    def _ratio_or_zero(self, total, count):
+        """Mean from a sum and count, or 0 when the count is 0."""
+        return total / count if count else 0
+
+    def calculate_average_changes(self, test_arrays, max_tests=None):
+        """
+        Mean change in per-test average score between consecutive tests, for multi-test users.
+
+        Args:
+            test_arrays (UserTestArrays): Output of compute_test_arrays
+            max_tests (int): Last test to include, every test any user took if None
+
+        Returns:
+            DataFrame: 'Power' and 'Acceleration' rows with one 'Test i→j' column per
+            pair of consecutive tests, 0 where nobody took both tests
+        """
+        if max_tests is None:
+            max_tests = max(test_arrays.n_tests, 2)
+
+        multi_test = test_arrays.valid_sex & (test_arrays.tests_per_user >= 2)
+        scores = test_arrays.per_test(test_arrays.test_scores, max_tests)[multi_test]
+
+        # (user x period x metric) changes, averaged over the users who took both tests
+        changes = scores[:, 1:] - scores[:, :-1]
+        counts = np.sum(~np.isnan(changes), axis=0)
+        averages = np.zeros(counts.shape)
+        np.divide(np.nansum(changes, axis=0), counts, out=averages, where=counts > 0)
+
+        return pd.DataFrame(
+            averages.T,
+            index=['Power', 'Acceleration'],
+            columns=[f'Test {i}→{i+1}' for i in range(1, max_tests)]
+        )
+
+    def retest_interval_days(self, df):
+        """
+        Days between consecutive tests of the same exercise by the same user.
+
+        Returns:
+            Series: One interval per retest, in whole days
+        """
+        # One grouped diff over the frame sorted by user, exercise and time
+        ordered = df[['user name', 'full_exercise_name', 'exercise createdAt']].sort_values(
+            ['user name', 'full_exercise_name', 'exercise createdAt'], kind='stable')
+        intervals = ordered.groupby(
+            ['user name', 'full_exercise_name'], sort=False, observed=True
+        )['exercise createdAt'].diff()
+        return intervals.dropna().dt.days
+
+    def retest_interval_histogram(self, df):
+        """Number of retests by interval in whole days (index = days), see retest_interval_days."""
+        days = self.retest_interval_days(df).to_numpy(dtype=np.int64)
+        return np.bincount(days) if len(days) else np.zeros(0, dtype=np.int64)
+
+    def calculate_retest_intervals(self, df):
+        """
+        Summary statistics of the days between tests of the same exercise.
+
+        Returns:
+            dict: count, mean, median and 25th/75th/90th percentiles of the
+            retest intervals (all 0 when nobody retested)
+        """
+        return self.summarize_retest_intervals(self.retest_interval_histogram(df))
 
-            except ValueError:
-                # Skip if category is not in bracket_order
-                pass
+    def summarize_retest_intervals(self, day_counts):
+        """
+        Retest interval statistics from a histogram of retests by days.
 
-    def _analyze_detailed_transitions(self, transitions_dict):
+        Percentiles interpolate linearly between intervals, as np.percentile does,
+        so merged histograms give the same result as the combined data.
         """
-        Create a transition matrix where:
+        day_counts = np.asarray(day_counts, dtype=np.int64)
+        count = int(day_counts.sum())
+        if count == 0:
+            return {'count': 0, 'mean': 0, 'median': 0, 'p25': 0, 'p75': 0, 'p90': 0}
+
+        # Value of the k-th smallest interval for the ranks either side of each percentile
+        positions = np.array([25, 50, 75, 90]) / 100 * (count - 1)
+        cumulative = np.cumsum(day_counts)
+        lower = np.searchsorted(cumulative, np.floor(positions), side='right')
+        upper = np.searchsorted(cumulative, np.ceil(positions), side='right')
+        p25, median, p75, p90 = lower + (upper - lower) * (positions - np.floor(positions))
+
+        mean = np.dot(np.arange(len(day_counts)), day_counts) / count
+        return {'count': count, 'mean': mean, 'median': median,
+                'p25': p25, 'p75': p75, 'p90': p90}
+
+    def _bracket_counts(self, codes, in_test):
+        """Bracket counts plus a 'Total Users' row for each test column of (user x test) codes."""
+        n_brackets = len(self.bracket_order)
+        n_tests = codes.shape[1]
+        counted = in_test & (codes >= 0)
+        tests = np.broadcast_to(np.arange(n_tests), codes.shape)[counted]
+
+        counts = np.zeros((n_brackets + 1, n_tests), dtype=np.int64)
+        counts[:n_brackets] = np.bincount(
+            tests * n_brackets + codes[counted], minlength=n_tests * n_brackets
+        ).reshape(n_tests, n_brackets).T
+        counts[n_brackets] = in_test.sum(axis=0)
+        return counts
+
+    def _transition_counts(self, codes, in_test):
+        """(period x from bracket x to bracket) counts for each pair of consecutive tests."""
+        n_brackets = len(self.bracket_order)
+        n_periods = codes.shape[1] - 1
+        from_codes, to_codes = codes[:, :-1], codes[:, 1:]
+        known = in_test[:, 1:] & (from_codes >= 0) & (to_codes >= 0)
+        periods = np.broadcast_to(np.arange(n_periods), known.shape)[known]
+
+        counts = np.bincount(
+            (periods * n_brackets + from_codes[known]) * n_brackets + to_codes[known],
+            minlength=n_periods * n_brackets ** 2
+        ).reshape(n_periods, n_brackets, n_brackets)
+        return counts
+
+    def style_transition_matrix(self, matrix):
+        """
+        Style a transition count matrix for display where:
         - Diagonal cells (no change) are Pale Blue
         - Above the diagonal (regression) is Pale Red
         - Below the diagonal (improvement) is Pale Green
-        """
-        transition_matrices = {}
 
-        for period, transitions in transitions_dict.items():
-            # Create an empty transition matrix
-            matrix = pd.DataFrame(0, 
-                index=self.bracket_order,
-                columns=self.bracket_order)
-
-            # Count transitions from each bracket to another
-            for from_bracket, to_bracket in transitions:
-                if from_bracket in self.bracket_order and to_bracket in self.bracket_order:
-                    matrix.loc[from_bracket, to_bracket] += 1
-
-            # Function to apply background color based on cell position
-            def highlight_cells(dataframe):
-                styles = pd.DataFrame("", index=dataframe.index, columns=dataframe.columns)
-
-                for i in range(len(dataframe)):  # Row index
-                    for j in range(len(dataframe.columns)):  # Column index
-                        base_style = "color: black; font-weight: bold; "
-                        if i == j:  # Diagonal (No movement)
-                            styles.iloc[i, j] = base_style + "background-color: lightblue;"
-                        elif i < j:  # Above diagonal (Regression)
-                            styles.iloc[i, j] = base_style + "background-color: lightcoral;"  # Pale Red
-                        else:  # Below diagonal (Improvement)
-                            styles.iloc[i, j] = base_style + "background-color: lightgreen;"  # Pale Green
-
-                return styles
-
-            # Create a new MultiIndex for the columns with centered text
-            col_index = pd.MultiIndex.from_tuples([
-                ('Ending Bracket', col) for col in matrix.columns
-            ])
-            matrix.columns = col_index
-
-            # Apply static color formatting, number formatting, and header styling to the DataFrame
-            styled_matrix = (matrix.style
-                           .format("{:.0f}")
-                           .apply(highlight_cells, axis=None)
-                           .set_table_styles([
-                               {
-                                   'selector': 'th.col_heading.level0',
-                                   'props': [('text-align', 'center'), 
-                                            ('font-weight', 'bold'),
-                                            ('background-color', '#f0f0f0'),
-                                            ('color', '#333333')]
-                               },
-                               {
-                                   'selector': 'th.col_heading.level1',
-                                   'props': [('text-align', 'center')]
-                               }
-                           ]))
-
-            transition_matrices[period] = styled_matrix
-
-        return transition_matrices
+        Styling is cached on the counts, so re-rendering the same matrix is free.
+        """
+        return _style_transition_counts(
+            tuple(matrix.index), tuple(matrix.columns), tuple(matrix.to_numpy().ravel().tolist()))
 
     def _analyze_transition_patterns(self, transitions_dict):
         """Analyze common transition patterns for level ups."""
@@ -314,266 +701,222 @@ class MatrixGenerator:
 
     def generate_user_matrices(self, df, user_name):
         """Generate test instance matrices for a specific user."""
-        user_data = df[df['user name'] == user_name].copy()
-
-        # Initialize matrices
-        power_matrix = {}
-        accel_matrix = {}
-        test_instances = {}
-
-        # Get user's sex for development calculations
+        user_data = df[df['user name'] == user_name]
         if user_data.empty:
-            return power_matrix, accel_matrix, None, None, None, None, None
-
-        user_sex = user_data['sex'].iloc[0]
-        if not isinstance(user_sex, str) or user_sex.lower() not in ['male', 'female']:
-            return power_matrix, accel_matrix, None, None, None, None, None
-
-        # Debug for Press/Pull exercises
-        press_pull_exercises = user_data[user_data['full_exercise_name'].str.contains('Horizontal Row|Chest Press', na=False)]
-        if not press_pull_exercises.empty:
-            print(f"Debug: User '{user_name}' has {len(press_pull_exercises)} Press/Pull exercises")
-            for _, row in press_pull_exercises.iterrows():
-                print(f"Debug: Exercise: {row['full_exercise_name']}, Power: {row['power - high']}, Accel: {row['acceleration - high']}")
-
-        # Process each exercise chronologically and keep power/acceleration paired
-        for _, row in user_data.iterrows():
-            exercise = row['full_exercise_name']
-            power_value = row['power - high']
-            accel_value = row['acceleration - high']
-
-            # Debug Press/Pull exercises
-            if 'Horizontal Row' in exercise or 'Chest Press' in exercise:
-                print(f"Debug: Processing Press/Pull for {user_name} - Exercise: {exercise}, Power: {power_value}, Accel: {accel_value}")
-
-            # Only process if both power and acceleration are present
-            if pd.notna(power_value) and pd.notna(accel_value):
-                # Find earliest available test instance for this exercise
-                target_instance = 1
-                while target_instance in test_instances and exercise in test_instances[target_instance]:
-                    target_instance += 1
-
-                # Initialize new test instance if needed
-                if target_instance not in power_matrix:
-                    power_matrix[target_instance] = {}
-                    accel_matrix[target_instance] = {}
-                    test_instances[target_instance] = set()
-
-                # Add exercise data to matrices as a pair
-                power_matrix[target_instance][exercise] = power_value
-                accel_matrix[target_instance][exercise] = accel_value
-                test_instances[target_instance].add(exercise)
-                
-                # Debug Press/Pull exercises
-                if 'Horizontal Row' in exercise or 'Chest Press' in exercise:
-                    print(f"Debug: Added to matrices - Test {target_instance}, Exercise: {exercise}, Power: {power_value}, Accel: {accel_value}")
-
-        # Fill empty cells with NaN
-        for instance in power_matrix:
-            for exercise in self.exercises:
-                if exercise not in power_matrix[instance]:
-                    power_matrix[instance][exercise] = np.nan
-                if exercise not in accel_matrix[instance]:
-                    accel_matrix[instance][exercise] = np.nan
-
-        # Convert to DataFrames
-        result = self._convert_to_dataframes(power_matrix, accel_matrix)
-        power_df, accel_df = result
-
-        # Generate development matrices if sex is available
-        power_dev_df = self._calculate_development_matrix(power_df, user_sex, 'power')
-        accel_dev_df = self._calculate_development_matrix(accel_df, user_sex, 'acceleration')
-
-        # Calculate overall development categorization
-        overall_dev_df = self._calculate_overall_development(power_dev_df, accel_dev_df)
-
-        # Add bracketing information
-        power_brackets = self._categorize_development(power_dev_df)
-        accel_brackets = self._categorize_development(accel_dev_df)
-
-        return power_df, accel_df, power_dev_df, accel_dev_df, overall_dev_df, power_brackets, accel_brackets
-
-    def _convert_to_dataframes(self, power_matrix, accel_matrix):
-        """Convert dictionary matrices to pandas DataFrames."""
-        # Create DataFrame for power
-        power_df = pd.DataFrame(power_matrix)
-        power_df = power_df.reindex(self.exercises)
-        power_df.columns = [f"Test {i}" for i in range(1, len(power_df.columns) + 1)]
-
-        # Create DataFrame for acceleration
-        accel_df = pd.DataFrame(accel_matrix)
-        accel_df = accel_df.reindex(self.exercises)
-        accel_df.columns = [f"Test {i}" for i in range(1, len(accel_df.columns) + 1)]
-        
-        return power_df, accel_df
-
-    def _calculate_development_matrix(self, metric_df, sex, metric_type):
-        """Calculate development scores for each value in the matrix."""
-        dev_matrix = metric_df.copy()
-
-        # Calculate development scores
-        for col in dev_matrix.columns:
-            for idx in dev_matrix.index:
-                value = metric_df.loc[idx, col]
-                dev_score = calculate_development_score(value, idx, sex, metric_type)
-                dev_matrix.loc[idx, col] = dev_score
-
-        return dev_matrix
+            return {}, {}, None, None, None, None, None
 
-    def _calculate_overall_development(self, power_dev_df, accel_dev_df):
-        """Calculate overall development categorization for each test instance."""
-        # Create data structure to store calculated values
-        overall_data = {}
+        return self.generate_all_user_matrices(user_data)[user_name]
 
-        # Calculate averages for each test instance
-        for col in power_dev_df.columns:
-            # Calculate power average (excluding NaN values)
-            power_avg = power_dev_df[col].apply(lambda x: min(x, 100) if pd.notnull(x) else x).mean(skipna=True)
+    def generate_user_matrices_from_store(self, store, user_name):
+        """Generate test instance matrices for a user whose sessions are in an AthleteStore."""
+        return self.generate_user_matrices(store.load_user(user_name), user_name)
 
-            # Calculate acceleration average (excluding NaN values)
-            accel_avg = accel_dev_df[col].apply(lambda x: min(x, 100) if pd.notnull(x) else x).mean(skipna=True)
+    def _build_user_matrices(self, power_values, accel_values, power_dev_values, accel_dev_values,
+                             power_scores, accel_scores, power_codes, accel_codes):
+        """Build one user's matrices from (exercise x test) value arrays and per-test scores."""
+        columns = [f"Test {i}" for i in range(1, power_values.shape[1] + 1)]
 
-            # Calculate overall average
-            overall_avg = np.mean([power_avg, accel_avg])
+        power_df = pd.DataFrame(power_values, index=self.exercises, columns=columns)
+        accel_df = pd.DataFrame(accel_values, index=self.exercises, columns=columns)
+        power_dev_df = pd.DataFrame(power_dev_values, index=self.exercises, columns=columns)
+        accel_dev_df = pd.DataFrame(accel_dev_values, index=self.exercises, columns=columns)
 
-            # Store values in dictionary
-            overall_data[col] = [power_avg, accel_avg, overall_avg]
-
-        # Create the DataFrame all at once to avoid fragmentation
-        overall_dev = pd.DataFrame(
-            overall_data,
-            index=['Power Average', 'Acceleration Average', 'Overall Average']
+        # Overall development categorization
+        overall_dev_df = pd.DataFrame(
+            [power_scores, accel_scores, (power_scores + accel_scores) / 2],
+            index=['Power Average', 'Acceleration Average', 'Overall Average'],
+            columns=columns
         )
 
-        return overall_dev
+        # Add bracketing information
+        power_brackets = self._brackets_frame(columns, power_scores, power_codes)
+        accel_brackets = self._brackets_frame(columns, accel_scores, accel_codes)
 
-    def _categorize_development(self, dev_matrix):
-        """Categorize development scores into brackets."""
-        # Initialize DataFrame for bracketing
-        brackets_df = pd.DataFrame(index=dev_matrix.columns, columns=['Category', 'Score'])
+        return power_df, accel_df, power_dev_df, accel_dev_df, overall_dev_df, power_brackets, accel_brackets
 
-        # Calculate overall average for each test instance (capped at 100%)
-        test_averages = dev_matrix.apply(
-            lambda x: x.apply(lambda y: min(y, 100) if pd.notnull(y) else y).mean(skipna=True)
-        )
+    def _test_averages(self, development):
+        """Average development score (capped at 100%) of every test, over the exercise axis."""
+        capped = np.minimum(development, 100)
+        counts = np.sum(~np.isnan(capped), axis=1)
+        totals = np.nansum(capped, axis=1)
+        averages = np.full(totals.shape, np.nan)
+        np.divide(totals, counts, out=averages, where=counts > 0)
+        return averages
 
-        # Categorize each test instance
-        for test in test_averages.index:
-            score = test_averages[test]
-            if pd.isna(score):
-                brackets_df.loc[test, 'Category'] = None
-                brackets_df.loc[test, 'Score'] = 'N/A'
-                continue
-
-            for category, (min_val, max_val) in self.development_brackets.items():
-                if min_val <= score <= max_val:
-                    brackets_df.loc[test, 'Category'] = category
-                    brackets_df.loc[test, 'Score'] = f"{score:.1f}%"
-                    break
-
-        return brackets_df
-
-    def calculate_body_region_averages(self, df, max_tests=4):
-        """Calculate average development scores by body region for multi-test users."""
-        from exercise_constants import VALID_EXERCISES
-
-        # Initialize results dictionary
-        body_region_averages = {
-            region: pd.DataFrame(
-                0.0,  # Initialize with float instead of int
-                index=['Power Average', 'Acceleration Average'],
-                columns=[f'Test {i}' for i in range(1, max_tests + 1)]
-            ) for region in VALID_EXERCISES.keys()
-        }
+    def categorize_scores(self, scores):
+        """
+        Map development scores to bracket codes with a binary search over bracket edges.
 
-        # Track number of users per test for each region
-        users_per_test = {
-            region: {f'Test {i}': 0 for i in range(1, max_tests + 1)}
-            for region in VALID_EXERCISES.keys()
-        }
+        Codes index into bracket_order (0 is 'Goal Hit'); missing scores get -1. Each
+        bracket covers [lower bound, next lower bound), so every score has a bracket.
+        """
+        scores = np.asarray(scores, dtype=float)
+        position = np.searchsorted(self.bracket_lower_bounds, scores, side='right') - 1
+        codes = len(self.bracket_order) - 1 - np.clip(position, 0, None)
+        return np.where(np.isnan(scores), -1, codes)
+
+    def _brackets_frame(self, columns, scores, codes):
+        """Category and formatted score per test instance."""
+        categories = [self.bracket_order[code] if code >= 0 else None for code in codes]
+        formatted = [f"{score:.1f}%" if code >= 0 else 'N/A' for score, code in zip(scores, codes)]
+        return pd.DataFrame({'Category': categories, 'Score': formatted}, index=columns, dtype=object)
+
+    def multi_test_rows(self, scored_df):
+        """Mask of the rows belonging to users with a known sex and at least two tests."""
+        by_user = scored_df.groupby('user name', sort=False, observed=True)
+        n_tests = by_user['test_instance'].transform('max')
+        first_sex = by_user['sex'].transform('first').astype(str).str.lower()
+        return (n_tests >= 2) & first_sex.isin(['male', 'female'])
+
+    def calculate_body_region_averages(self, df, max_tests=4, scored_df=None):
+        """
+        Calculate average development scores by body region for multi-test users.
 
-        # Process each user
-        for user in df['user name'].unique():
-            # Generate matrices for user
-            matrices = self.generate_user_matrices(df, user)
-            if matrices[2] is not None:  # If development matrices exist
-                power_dev, accel_dev = matrices[2], matrices[3]  # Get development matrices
-
-                # Only process multi-test users
-                if len(power_dev.columns) >= 2:
-                    # Process each body region
-                    for region, exercises in VALID_EXERCISES.items():
-                        # Only process up to max_tests columns
-                        test_cols = [col for col in power_dev.columns if int(col.split()[-1]) <= max_tests]
-
-                        for test_col in test_cols:
-                            # Get relevant exercises for this region (including dominance variations)
-                            region_exercises = []
-                            for exercise in exercises:
-                                matching_exercises = [ex for ex in power_dev.index if exercise in ex]
-                                region_exercises.extend(matching_exercises)
-
-                            # Calculate averages for this region if data exists
-                            power_scores = power_dev.loc[region_exercises, test_col].dropna()
-                            accel_scores = accel_dev.loc[region_exercises, test_col].dropna()
-
-                            if not power_scores.empty or not accel_scores.empty:
-                                # Calculate means only if we have valid scores
-                                if not power_scores.empty:
-                                    power_mean = power_scores.mean()
-                                    if pd.notna(power_mean):
-                                        body_region_averages[region].loc['Power Average', test_col] += power_mean
-                                if not accel_scores.empty:
-                                    accel_mean = accel_scores.mean()
-                                    if pd.notna(accel_mean):
-                                        body_region_averages[region].loc['Acceleration Average', test_col] += accel_mean
-                                users_per_test[region][test_col] += 1
-
-        # Calculate final averages
-        for region in VALID_EXERCISES.keys():
-            for test in body_region_averages[region].columns:
-                n_users = users_per_test[region][test]
-                if n_users > 0:
-                    body_region_averages[region][test] = body_region_averages[region][test] / n_users
-                else:
-                    body_region_averages[region][test] = np.nan
+        Each user's mean score per region and test is averaged over the users with
+        any score for that region and test. Pass max_tests=None to include every
+        test, and scored_df (the output of
+        score_dataset on assign_test_instances) to reuse an already scored dataset.
+        """
+        if scored_df is None:
+            scored_df = self.score_dataset(self.assign_test_instances(df))
+        if max_tests is None:
+            max_tests = int(scored_df['test_instance'].max()) if len(scored_df) else 1
+
+        test_columns = [f'Test {i}' for i in range(1, max_tests + 1)]
+        data = scored_df[self.multi_test_rows(scored_df) & (scored_df['test_instance'] <= max_tests)]
+        exercise_ids = EXERCISE_CATALOG.exercise_ids(data['full_exercise_name'])
+        region = pd.Series(
+            np.where(exercise_ids >= 0, EXERCISE_CATALOG.region_ids[exercise_ids], -1),
+            index=data.index, name='region')
+
+        # Mean score of every user for each region and test, then averaged across users
+        user_means = data.groupby(
+            ['user name', region, 'test_instance'], observed=True
+        )[['power_development', 'acceleration_development']].mean()
+        totals = user_means.groupby(level=['region', 'test_instance']).sum()
+        n_users = user_means.notna().any(axis=1).groupby(level=['region', 'test_instance']).sum()
+        averages = totals.div(n_users.where(n_users > 0), axis=0)
+        averages.columns = ['Power Average', 'Acceleration Average']
+
+        body_region_averages = {}
+        for region_id, region_name in enumerate(EXERCISE_CATALOG.regions):
+            if region_id in averages.index.get_level_values('region'):
+                region_averages = averages.xs(region_id, level='region')
+            else:
+                region_averages = averages.iloc[:0].droplevel('region')
+            region_averages = region_averages.reindex(range(1, max_tests + 1)).T
+            region_averages.columns = test_columns
+            body_region_averages[region_name] = region_averages.astype(float)
 
         return body_region_averages
         
     def calculate_test_changes(self, data_df):
         """
-        Calculate average changes between tests for the provided DataFrame.
+        Calculate average changes between consecutive tests for the provided DataFrame.
         Returns a dictionary with change metrics.
+
+        Every pair of consecutive 'Test n' columns gets 'test{i}_to_test{j}' (mean
+        change) and 'test{i}_to_test{j}_pct' (mean percent change) entries, computed
+        over the rows that have both tests and NaN when there are none.
         """
+        test_numbers = sorted(
+            int(col.split()[-1]) for col in data_df.columns
+            if isinstance(col, str) and col.startswith('Test ') and col.split()[-1].isdigit()
+        )
+        pairs = [(i, i + 1) for i in test_numbers if i + 1 in test_numbers]
+        if not pairs:
+            return {}
+
+        # Reduce every pair of tests at once over (row x pair) arrays
+        before = data_df[[f'Test {i}' for i, _ in pairs]].to_numpy(dtype=float)
+        after = data_df[[f'Test {j}' for _, j in pairs]].to_numpy(dtype=float)
+        valid = ~np.isnan(before) & ~np.isnan(after)
+        counts = valid.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(valid, after - before, 0).sum(axis=0) / counts
+            change_pct = np.where(valid, (after - before) / before * 100, 0).sum(axis=0) / counts
+
         changes = {}
-        
-        # Calculate Test 1 to Test 2 changes
-        if 'Test 1' in data_df.columns and 'Test 2' in data_df.columns:
-            # Get valid rows (non-NaN in both columns)
-            valid_rows = data_df[data_df['Test 1'].notna() & data_df['Test 2'].notna()]
-            if not valid_rows.empty:
-                # Calculate changes
-                changes['test1_to_test2'] = (valid_rows['Test 2'] - valid_rows['Test 1']).mean()
-                changes['test1_to_test2_pct'] = ((valid_rows['Test 2'] - valid_rows['Test 1']) / valid_rows['Test 1'] * 100).mean()
-            else:
-                changes['test1_to_test2'] = np.nan
-                changes['test1_to_test2_pct'] = np.nan
-        
-        # Calculate Test 2 to Test 3 changes
-        if 'Test 2' in data_df.columns and 'Test 3' in data_df.columns:
-            # Get valid rows (non-NaN in both columns)
-            valid_rows = data_df[data_df['Test 2'].notna() & data_df['Test 3'].notna()]
-            if not valid_rows.empty:
-                # Calculate changes
-                changes['test2_to_test3'] = (valid_rows['Test 3'] - valid_rows['Test 2']).mean()
-                changes['test2_to_test3_pct'] = ((valid_rows['Test 3'] - valid_rows['Test 2']) / valid_rows['Test 2'] * 100).mean()
-            else:
-                changes['test2_to_test3'] = np.nan
-                changes['test2_to_test3_pct'] = np.nan
-        
+        for k, (i, j) in enumerate(pairs):
+            has_rows = counts[k] > 0
+            changes[f'test{i}_to_test{j}'] = change[k] if has_rows else np.nan
+            changes[f'test{i}_to_test{j}_pct'] = change_pct[k] if has_rows else np.nan
         return changes
             
-    def get_region_metrics(self, df, region_name, max_tests=4):
+    def get_all_region_metrics(self, df, max_tests=4, scored_df=None):
+        """
+        Calculate detailed power and acceleration metrics for every body region in one pass.
+        Only includes multi-test users with separate metrics for power and acceleration.
+
+        Args:
+            df: The processed dataframe
+            max_tests: Maximum number of tests to include, every test if None
+            scored_df: Optional output of score_dataset on assign_test_instances, reused
+                instead of rescoring df
+
+        Returns:
+            dict: Region name -> (power_df, accel_df, power_changes, accel_changes,
+            lowest_power_change_exercise, lowest_power_change_value,
+            lowest_accel_change_exercise, lowest_accel_change_value), all None for a
+            region when there are no multi-test users
+        """
+        if scored_df is None:
+            scored_df = self.score_dataset(self.assign_test_instances(df))
+        if max_tests is None:
+            max_tests = int(scored_df['test_instance'].max()) if len(scored_df) else 1
+
+        data = scored_df[self.multi_test_rows(scored_df) & (scored_df['test_instance'] <= max_tests)]
+        if data.empty:
+            return {region: (None,) * 8 for region in VALID_EXERCISES}
+
+        # Average score of every exercise and test across multi-test users
+        exercise_ids = pd.Series(
+            EXERCISE_CATALOG.exercise_ids(data['full_exercise_name']), index=data.index, name='exercise')
+        exercise_means = data.groupby(
+            [exercise_ids, 'test_instance']
+        )[['power_development', 'acceleration_development']].mean()
+        test_columns = [f'Test {i}' for i in range(1, max_tests + 1)]
+
+        region_metrics = {}
+        for region_id, region in enumerate(EXERCISE_CATALOG.regions):
+            region_exercise_ids = np.flatnonzero(EXERCISE_CATALOG.region_ids == region_id)
+            tables = []
+            for column in ['power_development', 'acceleration_development']:
+                table = exercise_means[column].unstack().reindex(
+                    index=region_exercise_ids, columns=range(1, max_tests + 1))
+                table.index = [EXERCISE_CATALOG.names[i] for i in region_exercise_ids]
+                table.columns = test_columns
+                tables.append(table.astype(float))
+            power_df, accel_df = tables
+
+            region_metrics[region] = (
+                power_df, accel_df,
+                self.calculate_test_changes(power_df), self.calculate_test_changes(accel_df),
+                *self._lowest_change(power_df), *self._lowest_change(accel_df)
+            )
+
+        return region_metrics
+
+    def _lowest_change(self, data_df):
+        """
+        Exercise with the lowest percent change from Test 1 to Test 2, and that change.
+
+        A decline always ranks below any gain, so this is the most negative change if
+        there is one, otherwise the smallest positive change. (None, None) when no
+        exercise has both tests.
+        """
+        if 'Test 1' not in data_df.columns or 'Test 2' not in data_df.columns:
+            return None, None
+
+        test1, test2 = data_df['Test 1'], data_df['Test 2']
+        change_pct = ((test2 - test1) / test1 * 100)[test1.notna() & test2.notna() & (test1 > 0)]
+        if change_pct.empty:
+            return None, None
+
+        exercise = change_pct.idxmin()
+        return exercise, change_pct[exercise]
+
+    def get_region_metrics(self, df, region_name, max_tests=4, scored_df=None):
         """
         Calculate detailed power and acceleration metrics for the specified body region exercises.
         Only includes multi-test users with separate metrics for power and acceleration.
@@ -581,188 +924,17 @@ class MatrixGenerator:
         Args:
             df: The processed dataframe
             region_name: The name of the body region (e.g., 'Torso', 'Arms', etc.)
-            max_tests: Maximum number of tests to include
+            max_tests: Maximum number of tests to include, every test if None
+            scored_df: Optional output of score_dataset on assign_test_instances
             
         Returns:
-            power_df, accel_df, power_changes, accel_changes: DataFrames and change dictionaries
+            The region's entry from get_all_region_metrics, all None if the region
+            is not found
         """
-        # Import constants
-        from exercise_constants import VALID_EXERCISES
-        
-        # Get region exercises
-        region_exercises = VALID_EXERCISES.get(region_name, [])
-        
-        if not region_exercises:
-            return None, None, None, None  # Return None if region not found
-        
-        # Get all exercise variations including dominance
-        variations = []
-        for exercise in region_exercises:
-            # Include base exercises and variations with dominance
-            matching = [ex for ex in self.exercises if exercise in ex]
-            variations.extend(matching)
-        
-        # Special handling for Press/Pull exercises - make sure all variants are included
-        if region_name == 'Press/Pull':
-            press_pull_exercises = [
-                'Horizontal Row (One Hand) (Dominant)', 
-                'Horizontal Row (One Hand) (Non-Dominant)',
-                'Chest Press (One Hand) (Dominant)',
-                'Chest Press (One Hand) (Non-Dominant)'
-            ]
-            
-            # Ensure all Press/Pull exercises are in the variations list
-            for ex in press_pull_exercises:
-                if ex not in variations and ex in self.exercises:
-                    variations.append(ex)
-        
-        # Get users with multiple tests
-        multi_test_users = []
-        for user in df['user name'].unique():
-            # Generate matrices for user
-            matrices = self.generate_user_matrices(df, user)
-            if matrices[2] is not None:  # If development matrices exist
-                power_dev = matrices[2]  # Get power development matrix
-                
-                # Check if user has multiple tests
-                if len(power_dev.columns) >= 2:
-                    multi_test_users.append(user)
-                
-        if not multi_test_users:
-            return None, None, None, None  # Return None if no multi-test users
-
-        # Initialize DataFrames for power and acceleration
-        power_df = pd.DataFrame(
-            0.0,
-            index=variations,
-            columns=['Test 1', 'Test 2', 'Test 3', 'Test 4'][:max_tests]
-        )
-        
-        accel_df = pd.DataFrame(
-            0.0,
-            index=variations,
-            columns=['Test 1', 'Test 2', 'Test 3', 'Test 4'][:max_tests]
-        )
-
-        # Track user counts for each cell
-        power_count_df = pd.DataFrame(
-            0,
-            index=variations,
-            columns=['Test 1', 'Test 2', 'Test 3', 'Test 4'][:max_tests]
-        )
-        
-        accel_count_df = pd.DataFrame(
-            0,
-            index=variations,
-            columns=['Test 1', 'Test 2', 'Test 3', 'Test 4'][:max_tests]
-        )
-
-        # Process each user
-        for user in multi_test_users:
-            # Generate matrices for user
-            matrices = self.generate_user_matrices(df, user)
-            if matrices[2] is not None:  # If development matrices exist
-                power_dev, accel_dev = matrices[2], matrices[3]  # Get development matrices
-                
-                # Only process multi-test users
-                if len(power_dev.columns) >= 2:
-                    # Only process up to max_tests columns
-                    test_cols = [col for col in power_dev.columns if int(col.split()[-1]) <= max_tests]
-                    
-                    for test_col in test_cols:
-                        # Get power and acceleration values for region exercises
-                        for exercise in variations:
-                            if exercise in power_dev.index:
-                                # Get power development score
-                                power_value = power_dev.loc[exercise, test_col]
-                                if pd.notna(power_value):
-                                    power_df.loc[exercise, test_col] += power_value
-                                    power_count_df.loc[exercise, test_col] += 1
-                                
-                                # Get acceleration development score
-                                accel_value = accel_dev.loc[exercise, test_col]
-                                if pd.notna(accel_value):
-                                    accel_df.loc[exercise, test_col] += accel_value
-                                    accel_count_df.loc[exercise, test_col] += 1
-
-        # Calculate averages for each cell
-        for col in power_df.columns:
-            for idx in power_df.index:
-                # Power averages
-                count = power_count_df.loc[idx, col]
-                if count > 0:
-                    power_df.loc[idx, col] = power_df.loc[idx, col] / count
-                else:
-                    power_df.loc[idx, col] = np.nan
-                    
-                # Acceleration averages
-                count = accel_count_df.loc[idx, col]
-                if count > 0:
-                    accel_df.loc[idx, col] = accel_df.loc[idx, col] / count
-                else:
-                    accel_df.loc[idx, col] = np.nan
+        if region_name not in VALID_EXERCISES:
+            return (None,) * 8
 
-        # Calculate change metrics
-        power_changes = self.calculate_test_changes(power_df)
-        accel_changes = self.calculate_test_changes(accel_df)
-        
-        # Find exercise with lowest change for Test 1 to Test 2
-        # We want to prioritize negative changes, then smallest positive changes
-        lowest_power_change_exercise = None
-        lowest_power_change_value = None
-        has_negative_power = False
-        
-        lowest_accel_change_exercise = None
-        lowest_accel_change_value = None
-        has_negative_accel = False
-
-        # Find exercise with lowest change from Test 1 to Test 2 for power
-        if 'Test 1' in power_df.columns and 'Test 2' in power_df.columns:
-            for exercise in variations:
-                if exercise in power_df.index:
-                    test1_value = power_df.loc[exercise, 'Test 1']
-                    test2_value = power_df.loc[exercise, 'Test 2']
-                    
-                    if pd.notna(test1_value) and pd.notna(test2_value) and test1_value > 0:
-                        change_pct = ((test2_value - test1_value) / test1_value) * 100
-                        
-                        # If this is a negative change and we haven't found one yet, or
-                        # if we already have negative changes and this one is more negative
-                        if change_pct < 0:
-                            if not has_negative_power or change_pct < lowest_power_change_value:
-                                has_negative_power = True
-                                lowest_power_change_value = change_pct
-                                lowest_power_change_exercise = exercise
-                        # If we don't have any negative changes yet and this is a smaller positive
-                        # change than we've seen so far (or we haven't seen any yet)
-                        elif not has_negative_power and (lowest_power_change_value is None or change_pct < lowest_power_change_value):
-                            lowest_power_change_value = change_pct
-                            lowest_power_change_exercise = exercise
-
-        # Do similar calculation for acceleration
-        if 'Test 1' in accel_df.columns and 'Test 2' in accel_df.columns:
-            for exercise in variations:
-                if exercise in accel_df.index:
-                    test1_value = accel_df.loc[exercise, 'Test 1']
-                    test2_value = accel_df.loc[exercise, 'Test 2']
-                    
-                    if pd.notna(test1_value) and pd.notna(test2_value) and test1_value > 0:
-                        change_pct = ((test2_value - test1_value) / test1_value) * 100
-                        
-                        # Prioritize negative changes
-                        if change_pct < 0:
-                            if not has_negative_accel or change_pct < lowest_accel_change_value:
-                                has_negative_accel = True
-                                lowest_accel_change_value = change_pct
-                                lowest_accel_change_exercise = exercise
-                        # Then consider smallest positive changes
-                        elif not has_negative_accel and (lowest_accel_change_value is None or change_pct < lowest_accel_change_value):
-                            lowest_accel_change_value = change_pct
-                            lowest_accel_change_exercise = exercise
-        
-        # We already initialized values to None, so no further handling needed
-        
-        return power_df, accel_df, power_changes, accel_changes, lowest_power_change_exercise, lowest_power_change_value, lowest_accel_change_exercise, lowest_accel_change_value
+        return self.get_all_region_metrics(df, max_tests, scored_df)[region_name]
             
     def get_torso_region_metrics(self, df, max_tests=4):
         """
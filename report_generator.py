@@ -1,9 +1,86 @@
 """Report generator module for exercise data visualization."""
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
+import gzip
 import io
+import os
+from matrix_generator import transition_cell_positions
+
+# Report page up to the first section, and the closing markup after the last one
+REPORT_HEAD = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Exercise Development Distribution Report</title>
+            <style>
+                body {
+                    font-family: Arial, sans-serif;
+                    margin: 20px;
+                    padding: 0;
+                    color: #333;
+                }
+                h1, h2, h3, h4 {
+                    color: #2c3e50;
+                }
+                .container {
+                    max-width: 1200px;
+                    margin: 0 auto;
+                }
+                .table {
+                    border-collapse: collapse;
+                    margin: 25px 0;
+                    font-size: 0.9em;
+                    width: 100%;
+                    box-shadow: 0 0 20px rgba(0, 0, 0, 0.15);
+                }
+                .table thead tr {
+                    background-color: #2c3e50;
+                    color: #ffffff;
+                    text-align: left;
+                }
+                .table th,
+                .table td {
+                    padding: 12px 15px;
+                }
+                .table tbody tr {
+                    border-bottom: 1px solid #dddddd;
+                }
+                .table tbody tr:nth-of-type(even) {
+                    background-color: #f3f3f3;
+                }
+                .table tbody tr:last-of-type {
+                    border-bottom: 2px solid #2c3e50;
+                }
+                .chart-container {
+                    width: 100%;
+                    margin: 25px 0;
+                }
+                /* Transition table cell colors */
+                .diagonal {
+                    background-color: #d4e6f1 !important; /* Pale Blue for no change */
+                }
+                .above-diagonal {
+                    background-color: #f5b7b1 !important; /* Pale Red for regression */
+                }
+                .below-diagonal {
+                    background-color: #abebc6 !important; /* Pale Green for improvement */
+                }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h1>Exercise Development Distribution Report</h1>
+                
+"""
+
+REPORT_TAIL = """
+            </div>
+        </body>
+        </html>
+        """
 
 class ReportGenerator:
     """Generates reports for exercise data analysis."""
@@ -23,16 +100,9 @@ class ReportGenerator:
         Returns:
             bytes: PDF report as bytes
         """
-        # Create a report buffer
+        # Stream the report straight into a byte buffer
         report_buffer = io.BytesIO()
-        
-        # Create an HTML string for the report
-        html_content = self._generate_html_report(power_counts, accel_counts)
-        
-        # Return the HTML content as bytes
-        report_buffer.write(html_content.encode())
-        report_buffer.seek(0)
-        
+        self.write_html_report(report_buffer, power_counts, accel_counts)
         return report_buffer.getvalue()
     
     def create_distribution_chart(self, power_counts, accel_counts):
@@ -102,132 +172,112 @@ class ReportGenerator:
         
         return fig
     
-    def _generate_html_report(self, power_counts, accel_counts, power_transitions=None, accel_transitions=None):
+    def _transition_table_html(self, matrix):
         """
-        Generate HTML report content.
+        Render a transition count matrix as an HTML table, with cells classed
+        as diagonal, above-diagonal or below-diagonal for the report stylesheet.
+        """
+        cell_classes = np.array(['below-diagonal', 'diagonal', 'above-diagonal'])[
+            transition_cell_positions(*matrix.shape) + 1
+        ]
+        return (matrix.style
+                .set_td_classes(pd.DataFrame(cell_classes, index=matrix.index, columns=matrix.columns))
+                .set_table_attributes('class="table table-striped"')
+                .to_html())
+
+    def _iter_html_report(self, power_counts, accel_counts, power_transitions=None, accel_transitions=None,
+                          fig=None):
+        """
+        Yield the HTML report content one section at a time.
         
         Args:
             power_counts (DataFrame): Power development distribution
             accel_counts (DataFrame): Acceleration development distribution
-            power_transitions (dict): Dictionary of power transition matrices by period
-            accel_transitions (dict): Dictionary of acceleration transition matrices by period
-            
-        Returns:
-            str: HTML content
+            power_transitions (dict): Dictionary of power transition count matrices by period
+            accel_transitions (dict): Dictionary of acceleration transition count matrices by period
+            fig (Figure): Distribution chart to embed, created from the counts if omitted
         """
-        # Create a chart and convert to HTML
-        fig = self.create_distribution_chart(power_counts, accel_counts)
-        chart_html = fig.to_html(full_html=False, include_plotlyjs='cdn')
-        
-        # Convert dataframes to HTML tables
-        power_table = power_counts.to_html(classes='table table-striped', index=True)
-        accel_table = accel_counts.to_html(classes='table table-striped', index=True)
-        
-        # Generate transition tables HTML if provided
-        transitions_html = ""
-        if power_transitions and accel_transitions:
-            transitions_html += """
-            <h2>Transition Analysis</h2>
-            <p>Reading guide: Rows show starting bracket, columns show ending bracket. Numbers show how many users made each transition.</p>
-            """
-            
-            # Power transitions
-            transitions_html += "<h3>Power Transitions</h3>"
-            for period, matrix in power_transitions.items():
-                transitions_html += f"<h4>Period: {period}</h4>"
-                transitions_html += matrix.to_html(classes='table table-striped', index=True)
-            
-            # Acceleration transitions
-            transitions_html += "<h3>Acceleration Transitions</h3>"
-            for period, matrix in accel_transitions.items():
-                transitions_html += f"<h4>Period: {period}</h4>"
-                transitions_html += matrix.to_html(classes='table table-striped', index=True)
-        
-        # Create HTML content
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Exercise Development Distribution Report</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 20px;
-                    padding: 0;
-                    color: #333;
-                }}
-                h1, h2, h3, h4 {{
-                    color: #2c3e50;
-                }}
-                .container {{
-                    max-width: 1200px;
-                    margin: 0 auto;
-                }}
-                .table {{
-                    border-collapse: collapse;
-                    margin: 25px 0;
-                    font-size: 0.9em;
-                    width: 100%;
-                    box-shadow: 0 0 20px rgba(0, 0, 0, 0.15);
-                }}
-                .table thead tr {{
-                    background-color: #2c3e50;
-                    color: #ffffff;
-                    text-align: left;
-                }}
-                .table th,
-                .table td {{
-                    padding: 12px 15px;
-                }}
-                .table tbody tr {{
-                    border-bottom: 1px solid #dddddd;
-                }}
-                .table tbody tr:nth-of-type(even) {{
-                    background-color: #f3f3f3;
-                }}
-                .table tbody tr:last-of-type {{
-                    border-bottom: 2px solid #2c3e50;
-                }}
-                .chart-container {{
-                    width: 100%;
-                    margin: 25px 0;
-                }}
-                /* Transition table cell colors */
-                .diagonal {{
-                    background-color: #d4e6f1 !important; /* Pale Blue for no change */
-                }}
-                .above-diagonal {{
-                    background-color: #f5b7b1 !important; /* Pale Red for regression */
-                }}
-                .below-diagonal {{
-                    background-color: #abebc6 !important; /* Pale Green for improvement */
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>Exercise Development Distribution Report</h1>
-                
-                <h2>Power Development Distribution</h2>
-                {power_table}
+        yield REPORT_HEAD
+
+        # Distribution tables
+        yield """                <h2>Power Development Distribution</h2>
+                """
+        yield power_counts.to_html(classes='table table-striped', index=True)
+        yield """
                 
                 <h2>Acceleration Development Distribution</h2>
-                {accel_table}
+                """
+        yield accel_counts.to_html(classes='table table-striped', index=True)
+
+        # Create a chart and convert to HTML
+        if fig is None:
+            fig = self.create_distribution_chart(power_counts, accel_counts)
+        yield """
                 
                 <h2>Distribution Visualization</h2>
                 <div class="chart-container">
-                    {chart_html}
+                    """
+        yield fig.to_html(full_html=False, include_plotlyjs='cdn')
+        yield """
                 </div>
                 
-                {transitions_html}
-            </div>
-        </body>
-        </html>
+                """
+
+        # Transition tables, one period at a time
+        if power_transitions and accel_transitions:
+            yield """
+            <h2>Transition Analysis</h2>
+            <p>Reading guide: Rows show starting bracket, columns show ending bracket. Numbers show how many users made each transition.</p>
+            """
+            for title, transitions in [("Power Transitions", power_transitions),
+                                       ("Acceleration Transitions", accel_transitions)]:
+                yield f"<h3>{title}</h3>"
+                for period, matrix in transitions.items():
+                    yield f"<h4>Period: {period}</h4>"
+                    yield self._transition_table_html(matrix)
+
+        yield REPORT_TAIL
+
+    def write_html_report(self, output, power_counts, accel_counts, power_transitions=None,
+                          accel_transitions=None, fig=None, compress=False):
         """
-        
-        return html_content
-    
-    def generate_downloadable_html(self, power_counts, accel_counts, power_transitions=None, accel_transitions=None):
+        Stream the HTML report into a file or binary buffer section by section.
+
+        Only one section is held in memory at a time, so memory use does not grow
+        with the number of transition periods in the report.
+
+        Args:
+            output: File path, or binary file-like object left open after writing
+            power_counts (DataFrame): Power development distribution
+            accel_counts (DataFrame): Acceleration development distribution
+            power_transitions (dict): Dictionary of power transition count matrices by period
+            accel_transitions (dict): Dictionary of acceleration transition count matrices by period
+            fig (Figure): Distribution chart to embed, created from the counts if omitted
+            compress (bool): Write gzip-compressed HTML
+        """
+        sections = self._iter_html_report(power_counts, accel_counts, power_transitions, accel_transitions, fig)
+
+        if isinstance(output, (str, os.PathLike)):
+            with (gzip.open(output, 'wb') if compress else open(output, 'wb')) as stream:
+                self._write_sections(stream, sections)
+        elif compress:
+            with gzip.GzipFile(fileobj=output, mode='wb') as stream:
+                self._write_sections(stream, sections)
+        else:
+            self._write_sections(output, sections)
+
+    def _write_sections(self, stream, sections):
+        """Encode and write sections to a binary stream without closing it."""
+        writer = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        try:
+            for section in sections:
+                writer.write(section)
+            writer.flush()
+        finally:
+            writer.detach()
+
+    def generate_downloadable_html(self, power_counts, accel_counts, power_transitions=None, accel_transitions=None,
+                                   fig=None, compress=False):
         """
         Generate downloadable HTML report.
         
@@ -236,9 +286,13 @@ class ReportGenerator:
             accel_counts (DataFrame): Acceleration development distribution
             power_transitions (dict): Dictionary of power transition matrices by period
             accel_transitions (dict): Dictionary of acceleration transition matrices by period
+            fig (Figure): Distribution chart to embed, created from the counts if omitted
+            compress (bool): Return gzip-compressed HTML
             
         Returns:
             bytes: HTML report as bytes
         """
-        html_content = self._generate_html_report(power_counts, accel_counts, power_transitions, accel_transitions)
-        return html_content.encode('utf-8')
\ No newline at end of file
+        report_buffer = io.BytesIO()
+        self.write_html_report(report_buffer, power_counts, accel_counts, power_transitions, accel_transitions,
+                               fig, compress)
+        return report_buffer.getvalue()
\ No newline at end of file